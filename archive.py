@@ -24,6 +24,26 @@ class Archive:
 		self._results_counter = 0
 		self._models_counter = 0
 		self.model_of_ref = None
+		self.listeners = [] # notified after each recorded event (e.g. export sessions)
+		self.model_registry = {} # activities:fate of the last model with them (working, refuted, redundant, equivalent_collapsed)
+
+
+	def __getstate__(self): # listeners hold caches only: not pickled
+		state = self.__dict__.copy()
+		state['listeners'] = []
+		return state
+
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		if not 'listeners' in state: # archives pickled before listeners were introduced
+			self.listeners = []
+		if not 'model_registry' in state:
+			self.model_registry = {}
+
+
+	def subscribe(self, listener):
+		self.listeners.append(listener)
 
 
 	def record(self, event):
@@ -51,6 +71,7 @@ class Archive:
 
 		elif isinstance(event, RefutedModels):
 			self.working_models = self.working_models - set(event.refuted_models)
+			self.register_models(event.refuted_models, 'refuted')
 #			for model in event.refuted_models:
 #				self.working_models.remove(model)
 
@@ -59,9 +80,11 @@ class Archive:
 				model.ID = self.get_new_model_id()
 # append
 			self.working_models = self.working_models | set(event.revised_models)
+			self.register_models(event.revised_models, 'working')
 
-		elif isinstance(event, RedundantModel):
-			pass # not added, so no need to remove
+		elif isinstance(event, RedundantModel): # not added, so no need to remove
+			if not (event.model.intermediate_activities in self.model_registry):
+				self.register_models([event.model], 'redundant')
 
 		elif isinstance(event, AllModelsEmpiricallyEquivalent):
 			self.all_models_equivalent_counter += 1
@@ -70,6 +93,8 @@ class Archive:
 			best_models = [m for m in event.models if m.quality == max_quality]
 			chosen_model = choice(best_models)
 			self.working_models = set([chosen_model]) # was list, not set
+			self.register_models(event.models, 'equivalent_collapsed')
+			self.register_models([chosen_model], 'working')
 			event.model_left = chosen_model
 			print('all models equivalent!')
 			stdout.flush()
@@ -77,6 +102,9 @@ class Archive:
 		elif isinstance(event, RevisionFail):
 			self.revflag = True
 
+		elif isinstance(event, RevisionTruncated):
+			pass
+
 		elif isinstance(event, RevisedIgnoredUpdate):
 			pass
 
@@ -88,6 +116,7 @@ class Archive:
 				model.ID = self.get_new_model_id()
 #				self.working_models.append(model)
 			self.working_models = self.working_models | set(event.additional_models)
+			self.register_models(event.additional_models, 'working')
 
 		elif isinstance(event, AdditModProdFail):
 			self.revflag = True
@@ -100,6 +129,7 @@ class Archive:
 				model.ID = self.get_new_model_id()
 #				self.working_models.append(model)
 			self.working_models = self.working_models | set(event.models)
+			self.register_models(event.models, 'working')
 
 		elif isinstance(event,  InitialResults):
 			for exp in event.experiments:
@@ -115,6 +145,22 @@ class Archive:
 		else:
 			raise(TypeError, "Archive: event's type unknown: %s" % type(event))
 
+		for listener in self.listeners:
+			listener.notify(event)
+
+
+	def register_models(self, models, fate):
+		for model in models:
+			self.model_registry[model.intermediate_activities] = fate
+
+
+	def model_fate(self, model): # None if no model with these activities was seen
+		return self.model_registry.get(model.intermediate_activities)
+
+
+	def refuted_structures(self): # sets of activities
+		return [activities for (activities, fate) in self.model_registry.items() if (fate == 'refuted')]
+
 
 	def get_model_origin_event(self, model): # number of new results covered
 		for event in self.development_history:
@@ -199,6 +245,9 @@ class Archive:
 		self._results_counter += 1
 		return ID
 
+	def next_ids(self): # IDs the next new experiment and its first result will get (see NewResults)
+		return ('exp_%s' % len(self.known_results), 'res_%s' % self._results_counter)
+
 	def get_new_ent_id(self):
 		return 'ent_%s' % len(self.mnm_entities)
 
@@ -262,6 +311,14 @@ class RevisionFail(Event):
 	def __init__(self):
 		pass
 
+class RevisionTruncated(Event): # solver stopped early (reason: 'time', 'solutions' or 'heuristic': search not exhaustive); solutions returned may be incomplete
+	def __init__(self, model, reason, solutions, optimal):
+		Event.__init__(self)
+		self.model = model
+		self.reason = reason
+		self.solutions = solutions # number of solutions returned
+		self.optimal = optimal # whether returned solutions are proven optimal
+
 class AdditModProdFail(Event):
 	def __init__(self):
 		pass
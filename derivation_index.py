@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
+
+from archive import InitialResults, AcceptedResults
+import mnm_repr
+
+class DerivationIndex:
+	# what make_derivative_models() needs, kept between cycles: known results grouped by interventions
+	# (updated as results are accepted) and derived models per (base model structure, interventions)
+	def __init__(self, archive, max_derived=10000):
+		self.archive = archive
+		self.number_results = 0
+		self.groups = {} # interventions:results (in order of acceptance)
+		self.derived = {} # (setup, activities, termination, interventions):derived model (without ID)
+		self.max_derived = max_derived # all derived models forgotten when exceeded (hypothetical models pile up)
+		for exp in archive.known_results:
+			self.add_experiment(exp)
+		archive.subscribe(self)
+
+
+	def notify(self, event):
+		if isinstance(event, AcceptedResults):
+			self.add_experiment(event.experiment)
+
+		elif isinstance(event, InitialResults):
+			for exp in event.experiments:
+				self.add_experiment(exp)
+
+		else:
+			pass
+
+
+	def add_experiment(self, exp):
+		for res in exp.results:
+			self.groups.setdefault(res.exp_description.interventions, []).append(res)
+			self.number_results += 1
+
+
+	def group_results(self, results):
+		# results are a subset of known results: all of them if their number is the same
+		if len(results) == self.number_results:
+			return self.groups
+		groups = {}
+		for res in results:
+			groups.setdefault(res.exp_description.interventions, []).append(res)
+		return groups
+
+
+	def derived_model(self, base_model, interventions, ID):
+		key = (base_model.setup_conditions, base_model.intermediate_activities, base_model.termination_conditions, interventions)
+		if not (key in self.derived):
+			if len(self.derived) >= self.max_derived:
+				self.derived = {}
+			derived_model = mnm_repr.Model(None, base_model.setup_conditions, base_model.intermediate_activities, base_model.termination_conditions)
+			derived_model.apply_interventions(interventions)
+			self.derived[key] = derived_model
+		cached = self.derived[key] # sets are immutable: shared between models with different IDs
+		return mnm_repr.Model(ID, cached.setup_conditions, cached.intermediate_activities, cached.termination_conditions)
@@ -11,16 +11,22 @@ from mnm_repr import PresentEntity, Add, Remove
 
 from archive import ExpDesignFail, ChosenExperiment, AllModelsEmpiricallyEquivalent
 
+from export_session import ExportSession
+
 from time import gmtime
 
 class ExperimentModule:
 	# module for experiment design. Method relies on splitting sum of models' probabilities (qualities) in half.
 	# If no model quality modules is used, then model quality = 1 and is constant throught development time.
 	# In that case the algorithm just splits set of working models in half.
-	def __init__(self, archive, cost_model, use_costs, sfx=""):
+	def __init__(self, archive, cost_model, use_costs, sfx="", delta_models=False, incremental_export=False):
 		self.archive = archive
 		self.cost_model = cost_model
 		self.use_costs = use_costs
+		self.delta_models = delta_models # export models as consensus + deltas
+		self.export_session = None
+		if incremental_export: # elements, models and bans kept up to date between cycles
+			self.export_session = ExportSession(archive)
 		self.work_file = './temp/workfile_gringo_clasp_%s' % sfx
 
 
@@ -37,9 +43,8 @@ class ExperimentModule:
 #		time_stamp = '_'.join([str(x) for x in [current_time[0], current_time[1], current_time[2], current_time[3], current_time[4], current_time[5]]])
 #		modified_workfile = '_'.join([self.work_file, time_stamp])
 		# try remove the file
-		with open(self.work_file, 'w') as f:
-			for string in exp_input:
-				read_data = f.write(string)
+		with open(self.work_file, 'wb') as f:
+			exporter.write_program(f, [exp_input])
 		# could suppress there warnig messages later on
 		gringo = subprocess.Popen(['gringo', self.work_file], stdout=subprocess.PIPE)
 		clasp = subprocess.Popen(['clasp', '-n', '0'], stdin=gringo.stdout, stdout=subprocess.PIPE)
@@ -52,17 +57,29 @@ class ExperimentModule:
 	def prepare_input_for_exp_design(self):
 		exported = []
 		exported.extend(exporter.hide_show_statements()) # export hide/show stuff
-		exported.extend(exporter.export_compartments(self.archive.mnm_compartments))
-		exported.extend(exporter.export_entities(self.archive.mnm_entities))
-		exported.extend(exporter.export_activities(self.archive.mnm_activities + self.archive.import_activities))
-		exported.extend(exporter.export_models_exp_design(self.archive.working_models)) # export models info
+		if self.export_session != None:
+			exported.extend(self.export_session.export_elements())
+		else:
+			exported.extend(exporter.export_compartments(self.archive.mnm_compartments))
+			exported.extend(exporter.export_entities(self.archive.mnm_entities))
+			exported.extend(exporter.export_activities(self.archive.mnm_activities + self.archive.import_activities))
+		if self.delta_models:
+			exported.extend(exporter.export_models_exp_design(self.archive.working_models, True)) # export models info
+			exported.extend(exporter.consensus_delta_rules())
+		elif self.export_session != None:
+			exported.extend(self.export_session.export_models())
+		else:
+			exported.extend(exporter.export_models_exp_design(self.archive.working_models)) # export models info
 		exported.extend(exporter.models_nr_and_probabilities(self.archive.working_models)) # + probabilities and numbers
 		exported.append(exporter.modeh_replacement(self.cost_model)) # export design elements (modeh eqiv)
 		exported.extend(exporter.design_constraints_basic()) # export rules forcing and restricting exp design
-		for exp in self.archive.known_results:
-			exp_descriptions = [res.exp_description for res in exp.results]
-			for des in exp_descriptions:
-				exported.extend(exporter.ban_experiment(des)) # export ban experiment(s) (from old exps)
+		if self.export_session != None:
+			exported.extend(self.export_session.export_bans())
+		else:
+			for exp in self.archive.known_results:
+				exp_descriptions = [res.exp_description for res in exp.results]
+				for des in exp_descriptions:
+					exported.extend(exporter.ban_experiment(des)) # export ban experiment(s) (from old exps)
 		exported.append(exporter.constant_for_calculating_score(self.calculate_constant_for_scores())) # calculate constant for scores and export it
 		exported.extend(exporter.advanced_exp_design_rules()) # export scoring rules/optimisation
 		if self.use_costs: # * export cost, and optimisation rule for that
@@ -269,8 +286,8 @@ class ExperimentModule:
 
 
 class BasicExpModuleNoCosts(ExperimentModule):
-	def __init__(self, archive, cost_model, sfx=""):
-		ExperimentModule.__init__(self, archive, cost_model, use_costs=False, sfx=sfx)
+	def __init__(self, archive, cost_model, sfx="", **options):
+		ExperimentModule.__init__(self, archive, cost_model, use_costs=False, sfx=sfx, **options)
 
 	def get_experiment(self):
 		exps = self.design_experiments()
@@ -283,8 +300,8 @@ class BasicExpModuleNoCosts(ExperimentModule):
 
 
 class BasicExpModuleWithCosts(ExperimentModule):
-	def __init__(self, archive, cost_model, sfx=""):
-		ExperimentModule.__init__(self, archive, cost_model, use_costs=True, sfx=sfx)
+	def __init__(self, archive, cost_model, sfx="", **options):
+		ExperimentModule.__init__(self, archive, cost_model, use_costs=True, sfx=sfx, **options)
 
 	def get_experiment(self):
 		exps = self.design_experiments()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+# I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
+
+import exporter
+
+from archive import InitialResults, AcceptedResults, InitialModels, RefutedModels, RevisedModel, AdditionalModels, AllModelsEmpiricallyEquivalent
+
+class ExportSession:
+	# keeps exported (serialised) parts of the program that change little between cycles:
+	# results, experiment bans and working models. Subscribes to archive events and updates
+	# only the affected segments; programs are then assembled from cached segments.
+	def __init__(self, archive):
+		self.archive = archive
+		self.results = [] # Result objects (flattened experiments)
+		self.results_strings = []
+		self.bans_strings = []
+		self.models_strings = {} # (id(model), model.ID):(model, specification); models with equal structure may differ in ID
+		self._elements_strings = []
+		self._elements_key = None
+		for exp in archive.known_results:
+			self.add_experiment(exp)
+		self.sync_models()
+		archive.subscribe(self)
+
+
+	def notify(self, event):
+		if isinstance(event, AcceptedResults):
+			self.add_experiment(event.experiment)
+
+		elif isinstance(event, InitialResults):
+			for exp in event.experiments:
+				self.add_experiment(exp)
+
+		elif (isinstance(event, InitialModels) or isinstance(event, RefutedModels) or isinstance(event, RevisedModel)
+			or isinstance(event, AdditionalModels) or isinstance(event, AllModelsEmpiricallyEquivalent)):
+			self.sync_models()
+
+		else:
+			pass
+
+
+	def add_experiment(self, exp):
+		results = list(exp.results)
+		self.results.extend(results)
+		self.results_strings.extend(exporter.export_results(results))
+		for res in results:
+			self.bans_strings.append(exporter.ban_experiment(res.exp_description))
+
+
+	def sync_models(self):
+		working_models = dict([((id(mod), mod.ID), mod) for mod in self.archive.working_models])
+		for key in [k for k in self.models_strings if not (k in working_models)]: # refuted or dropped
+			del self.models_strings[key]
+		for key in working_models:
+			if not (key in self.models_strings): # new model
+				self.models_strings[key] = (working_models[key], exporter.export_model_specification(working_models[key]))
+
+
+	def export_elements(self):
+		# elements are set up before development starts; re-exported only if their number changed
+		key = (len(self.archive.mnm_entities), len(self.archive.mnm_compartments), len(self.archive.mnm_activities), len(self.archive.import_activities))
+		if key != self._elements_key:
+			exped_entities = exporter.export_entities(self.archive.mnm_entities)
+			exped_compartments = exporter.export_compartments(self.archive.mnm_compartments)
+			exped_activities = exporter.export_activities(self.archive.mnm_activities + self.archive.import_activities)
+			self._elements_strings = exped_entities + exped_compartments + exped_activities
+			self._elements_key = key
+		return list(self._elements_strings)
+
+
+	def export_results(self):
+		return list(self.results_strings)
+
+
+	def export_bans(self):
+		return list(self.bans_strings)
+
+
+	def export_models(self):
+		# the same as exporter.export_models_exp_design(archive.working_models)
+		self.sync_models() # in case working models were changed without an event
+		models = exporter.ordered(list(self.archive.working_models))
+		strings = [';'.join([x.ID for x in models]).join(['\nmodel(', ').'])]
+		for model in models:
+			strings.extend(self.models_strings[(id(model), model.ID)][1])
+		return strings
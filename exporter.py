@@ -7,207 +7,587 @@ import exp_repr
 from exp_repr import DetectionEntity, LocalisationEntity, DetectionActivity, AdamTwoFactorExperiment
 from mnm_repr import Activity, Condition
 
+import hashlib
+
+canonical_ordering = False # sort exported elements by stable keys: the same problem gives byte-identical programs
+
+
+def set_canonical_ordering(flag):
+	global canonical_ordering
+	canonical_ordering = flag
+
+
+def ordered(elements, key=None): # iteration order of sets and dicts depends on hash randomisation
+	if canonical_ordering:
+		return sorted(elements, key=(key or stable_key))
+	return elements
+
+
+def stable_key(element): # independent of hash randomisation and of the process
+	if isinstance(element, mnm_repr.Entity):
+		return ('entity', str(element.ID), str(element.version), type(element).__name__)
+	elif isinstance(element, mnm_repr.Activity):
+		return ('activity', str(element.ID))
+	elif isinstance(element, mnm_repr.Compartment):
+		return ('compartment', str(element.ID))
+	elif isinstance(element, mnm_repr.PresentEntity):
+		return ('condition', type(element).__name__, str(element.entity.ID), str(element.entity.version), str(element.compartment.ID))
+	elif isinstance(element, mnm_repr.Condition):
+		return ('condition', type(element).__name__, str(element.compartment.ID))
+	elif isinstance(element, mnm_repr.Intervention):
+		return (type(element).__name__,) + stable_key(element.condition_or_activity)
+	elif isinstance(element, mnm_repr.Property):
+		return ('property', type(element).__name__, str(element.activity.ID))
+	elif isinstance(element, (frozenset, set)): # e.g. set of interventions
+		return ('set',) + tuple(sorted([stable_key(x) for x in element]))
+	elif isinstance(element, str):
+		return ('string', element)
+	else: # models, results, experiments: by ID
+		return (type(element).__name__, str(element.ID))
+
+
+def program_fingerprint(strings): # stable identifier of an exported program (e.g. for caching solver calls)
+	digest = hashlib.sha1()
+	for string in strings:
+		digest.update(string.encode('utf-8'))
+	return digest.hexdigest()
+
+
+def write_program(sink, parts, buffer_size=65536):
+	# writes iterables of strings (lists or iter_* generators) into a binary sink (file, pipe, io.BytesIO)
+	# in buffered chunks; the program is never held in memory as a whole. Returns number of bytes written.
+	buffered = []
+	buffered_length = 0
+	written = 0
+	for part in parts:
+		for string in part:
+			buffered.append(string)
+			buffered_length += len(string)
+			if buffered_length >= buffer_size:
+				chunk = ''.join(buffered).encode('utf-8')
+				sink.write(chunk)
+				written += len(chunk)
+				buffered = []
+				buffered_length = 0
+	chunk = ''.join(buffered).encode('utf-8')
+	sink.write(chunk)
+	written += len(chunk)
+	return written
+
+
 def export_entities(entities):
-	strings = []
-	for ent in entities:
+	return list(iter_entities(entities))
+
+
+def iter_entities(entities):
+	for ent in ordered(entities):
 		if isinstance(ent, mnm_repr.Gene):
-			strings.append("\ngene(%s,%s)." %(ent.ID, ent.version))
+			yield "\ngene(%s,%s)." %(ent.ID, ent.version)
 		elif isinstance(ent, mnm_repr.Metabolite):
-			strings.append("\nmetabolite(%s,%s)." %(ent.ID, ent.version))
+			yield "\nmetabolite(%s,%s)." %(ent.ID, ent.version)
 		elif isinstance(ent, mnm_repr.Protein):
-			strings.append("\nprotein(%s,%s)." %(ent.ID, ent.version))
+			yield "\nprotein(%s,%s)." %(ent.ID, ent.version)
 		elif isinstance(ent, mnm_repr.Complex):
-			strings.append("\ncomplex(%s,%s)." %(ent.ID, ent.version))
+			yield "\ncomplex(%s,%s)." %(ent.ID, ent.version)
 		else:
 			raise TypeError("export_entities: entity type not recognised:%s" % type(ent))
 
 		if ent.properties == frozenset([]):
 			continue
 
-		for prop in ent.properties:
+		for prop in ordered(ent.properties):
 			if isinstance(prop, mnm_repr.Catalyses):
-				strings.append("\ncatalyses(%s,%s,%s)." % (ent.ID, ent.version, prop.activity.ID))
+				yield "\ncatalyses(%s,%s,%s)." % (ent.ID, ent.version, prop.activity.ID)
 			elif isinstance(prop, mnm_repr.Transports):
-				strings.append("\ntransports(%s,%s,%s)." % (ent.ID, ent.version, prop.activity.ID))
+				yield "\ntransports(%s,%s,%s)." % (ent.ID, ent.version, prop.activity.ID)
 			else:	
 				raise TypeError("export_entities: property type not recognised:%s" % type(prop))
 
-	return strings
-
 
 def export_compartments(compartments):
-	comps = ";".join([comp.ID for comp in compartments])
+	comps = ";".join([comp.ID for comp in ordered(compartments)])
 	return [comps.join(['\ncompartment(', ').'])]
 
 
 def export_activities(activities):
-	strings = []
+	return list(iter_activities(activities))
+
+
+def iter_activities(activities):
+	activities = ordered(activities)
 	for act in activities:
 		if isinstance(act, mnm_repr.Growth):
-			strings.append('\ngrowth(%s).' % act.ID)
+			yield '\ngrowth(%s).' % act.ID
 		elif isinstance(act, mnm_repr.Expression):
-			strings.append('\nexpression(%s).' % act.ID)
+			yield '\nexpression(%s).' % act.ID
 		elif isinstance(act, mnm_repr.Reaction):
-			strings.append('\nreaction(%s).' % act.ID)
+			yield '\nreaction(%s).' % act.ID
 		elif isinstance(act, mnm_repr.Transport):
-			strings.append('\ntransport(%s).' % act.ID)
+			yield '\ntransport(%s).' % act.ID
 		elif isinstance(act, mnm_repr.ComplexFormation):
-			strings.append('\ncomplex_formation(%s).' % act.ID)
+			yield '\ncomplex_formation(%s).' % act.ID
 		else:
 			raise TypeError("export_activities: activity type not recognised: %s" % type(act))
 
 	for act in activities:
-		strings.extend(export_activity(act))
-	return strings
+		yield from iter_activity(act)
 
 
 def export_activity(activity):
-	strings = []
-	for req in activity.required_conditions:
+	return list(iter_activity(activity))
+
+
+def iter_activity(activity):
+	for req in ordered(activity.required_conditions):
 		if isinstance(req, mnm_repr.PresentEntity):
-			strings.append('\nsubstrate(%s,%s,%s,%s).' % (req.entity.ID, req.entity.version, req.compartment.ID, activity.ID))
+			yield '\nsubstrate(%s,%s,%s,%s).' % (req.entity.ID, req.entity.version, req.compartment.ID, activity.ID)
 		elif isinstance(req, mnm_repr.PresentCatalyst):		
-			strings.append('\nenz_required(%s).' % activity.ID)
-			strings.append('\nenz_compartment(%s,%s).' % (req.compartment.ID, activity.ID))
+			yield '\nenz_required(%s).' % activity.ID
+			yield '\nenz_compartment(%s,%s).' % (req.compartment.ID, activity.ID)
 		elif isinstance(req, mnm_repr.PresentTransporter):
-			strings.append('\ntransp_required(%s).' % activity.ID)
-			strings.append('\ntransp_compartment(%s,%s).' % (req.compartment.ID, activity.ID))
+			yield '\ntransp_required(%s).' % activity.ID
+			yield '\ntransp_compartment(%s,%s).' % (req.compartment.ID, activity.ID)
 		else:
 			raise TypeError("export_activity: requirement type not recognised:%s" % type(req))
 
-	for change in activity.changes:
-		strings.append('\nproduct(%s,%s,%s,%s).' % (change.entity.ID, change.entity.version, change.compartment.ID, activity.ID))
-
-	return strings
+	for change in ordered(activity.changes):
+		yield '\nproduct(%s,%s,%s,%s).' % (change.entity.ID, change.entity.version, change.compartment.ID, activity.ID)
 
 
 def export_results(results):
-	strings = []
-	for result in results:
+	return list(iter_results(results))
+
+
+def iter_results(results):
+	for result in ordered(results):
 		ID = result.ID
 		out = result.outcome
 		if isinstance(result.exp_description.experiment_type, exp_repr.ReconstructionTransporterRequired):
 			act = result.exp_description.experiment_type.transport_activity_id
 			trp = result.exp_description.experiment_type.transporter_id
-			strings.append('\nresult(%s, experiment(transp_reconstruction_exp, %s, %s), %s).' % (ID, act, trp, out))
+			yield '\nresult(%s, experiment(transp_reconstruction_exp, %s, %s), %s).' % (ID, act, trp, out)
 
 		elif isinstance(result.exp_description.experiment_type, exp_repr.ReconstructionEnzReaction):
 			act = result.exp_description.experiment_type.reaction_id
 			enz = result.exp_description.experiment_type.enzyme_id
-			strings.append('\nresult(%s, experiment(enz_reconstruction_exp, %s, %s), %s).' % (ID, act, enz, out))
+			yield '\nresult(%s, experiment(enz_reconstruction_exp, %s, %s), %s).' % (ID, act, enz, out)
 
 		elif isinstance(result.exp_description.experiment_type, exp_repr.ReconstructionActivity):
 			act = result.exp_description.experiment_type.activity_id
-			strings.append('\nresult(%s, experiment(basic_reconstruction_exp, %s), %s).' % (ID, act, out))
+			yield '\nresult(%s, experiment(basic_reconstruction_exp, %s), %s).' % (ID, act, out)
 
 		elif isinstance(result.exp_description.experiment_type, exp_repr.AdamTwoFactorExperiment):
 			gene = result.exp_description.experiment_type.gene_id
 			met = result.exp_description.experiment_type.metabolite_id
-			strings.append('\nresult(%s, experiment(adam_two_factor_exp, %s, %s), %s).' % (ID, gene, met, out))
+			yield '\nresult(%s, experiment(adam_two_factor_exp, %s, %s), %s).' % (ID, gene, met, out)
 
 		elif isinstance(result.exp_description.experiment_type, exp_repr.DetectionActivity):
 			act = result.exp_description.experiment_type.activity_id
-			strings.append('\nresult(%s, experiment(detection_activity_exp, %s), %s).' % (ID, act, out))
+			yield '\nresult(%s, experiment(detection_activity_exp, %s), %s).' % (ID, act, out)
 
 		elif isinstance(result.exp_description.experiment_type, exp_repr.LocalisationEntity):
 			ent = result.exp_description.experiment_type.entity_id
 			comp = result.exp_description.experiment_type.compartment_id
-			strings.append('\nresult(%s, experiment(localisation_entity_exp, %s, %s), %s).' % (ID, ent, comp, out))
+			yield '\nresult(%s, experiment(localisation_entity_exp, %s, %s), %s).' % (ID, ent, comp, out)
 
 		elif isinstance(result.exp_description.experiment_type, exp_repr.DetectionEntity):
 			ent = result.exp_description.experiment_type.entity_id
-			strings.append('\nresult(%s, experiment(detection_entity_exp, %s), %s).' % (ID, ent, out))
+			yield '\nresult(%s, experiment(detection_entity_exp, %s), %s).' % (ID, ent, out)
 
 		else:
 			raise TypeError('export_results: result type not recognised:%s' % type(result))
 
-	return strings
 
+def export_models(models_results, delta=False):
+	return list(iter_models(models_results, delta))
 
-def export_models(models_results):
-	strings = []
+
+def iter_models(models_results, delta=False):
+	if delta:
+		yield from iter_models_consensus_delta(models_results.keys())
+		return
+	models = ordered(list(models_results.keys()))
 	# model().
-	joined_models = ';'.join([x.ID for x in models_results.keys()])
-	strings.append(joined_models.join(['\nmodel(', ').']))
+	joined_models = ';'.join([x.ID for x in models])
+	yield joined_models.join(['\nmodel(', ').'])
 	# specification:
-	for model in models_results.keys():
-		strings.extend(export_model_specification(model))
+	for model in models:
+		yield from iter_model_specification(model)
+
+
+def export_models_consensus_delta(models):
+	return list(iter_models_consensus_delta(models))
+
+
+def iter_models_consensus_delta(models):
+	# models as one shared core + per-model differences; needs consensus_delta_rules()
+	models = ordered(list(models))
+	# model().
+	joined_models = ';'.join([x.ID for x in models])
+	yield joined_models.join(['\nmodel(', ').'])
+	# consensus: elements present in more than half of the models (minimises size of deltas)
+	models_terms = [(model, export_model_terms(model)) for model in models]
+	counts = {}
+	for (model, terms) in models_terms:
+		for term in terms:
+			counts[term] = counts.get(term, 0) + 1
+	consensus = ordered([term for term in counts if (counts[term]*2 > len(models))])
+	for term in consensus:
+		yield '\nconsensus(%s).' % term
+	# deltas:
+	consensus = set(consensus)
+	for (model, terms) in models_terms:
+		for term in terms:
+			if term not in consensus:
+				yield '\ndelta_added(%s,%s).' % (term, model.ID)
+		for term in ordered(consensus - set(terms)):
+			yield '\ndelta_removed(%s,%s).' % (term, model.ID)
+
+
+def export_models_derived(models, base_model):
+	return list(iter_models_derived(models, base_model))
+
+
+def iter_models_derived(models, base_model):
+	# derived models as what their interventions change in the base model; needs derived_models_rules()
+	models = ordered(list(models))
+	# model().
+	joined_models = ';'.join([x.ID for x in models])
+	yield joined_models.join(['\nmodel(', ').'])
+	yield from iter_derived_specification(models, base_model)
+
+
+def iter_derived_specification(models, base_model):
+	# base model: the one with the base model's structure (derived models that change nothing are merged with it)
+	base = [model for model in models if model == base_model][0]
+	yield from iter_model_specification(base)
+	base_terms = set(export_model_terms(base))
+	for model in models:
+		if model is base:
+			continue
+		yield '\nderived_from(%s,%s).' % (model.ID, base.ID)
+		terms = export_model_terms(model)
+		for term in terms:
+			if term not in base_terms:
+				yield '\nderived_added(%s,%s).' % (term, model.ID)
+		for term in ordered(base_terms - set(terms)):
+			yield '\nderived_removed(%s,%s).' % (term, model.ID)
+
+
+def export_model_terms(model): # model's setup and activities as used in added_to_model/2
+	terms = []
+	for cond in ordered(model.setup_conditions):
+		terms.append('setup_present(%s,%s,%s)' % (cond.entity.ID, cond.entity.version, cond.compartment.ID))
+	for act in ordered(model.intermediate_activities):
+		terms.append(act.ID)
+	return terms
+
 
-	return strings
-	
 def export_model_specification(model):
-	strings = []
+	return list(iter_model_specification(model))
+
+
+def iter_model_specification(model):
 	# setup
-	for cond in model.setup_conditions:
-		strings.append('\nadded_to_model(setup_present(%s,%s,%s),%s).' % (cond.entity.ID, cond.entity.version, cond.compartment.ID, model.ID))
+	for cond in ordered(model.setup_conditions):
+		yield '\nadded_to_model(setup_present(%s,%s,%s),%s).' % (cond.entity.ID, cond.entity.version, cond.compartment.ID, model.ID)
 	# activities
-	for act in model.intermediate_activities:
-		strings.append('\nadded_to_model(%s,%s).' % (act.ID, model.ID))
-
-	return strings
+	for act in ordered(model.intermediate_activities):
+		yield '\nadded_to_model(%s,%s).' % (act.ID, model.ID)
 
 
 def export_termination_conds_revision(base_model):
-	strings = []
-	for cond in base_model.termination_conditions:
-		strings.append('\n#example synthesizable(%s, %s, %s, %s).' % (cond.entity.ID, cond.entity.version, cond.compartment.ID, base_model.ID))
+	return list(iter_termination_conds_revision(base_model))
+
+
+def iter_termination_conds_revision(base_model):
+	for cond in ordered(base_model.termination_conditions):
+		yield '\n#example synthesizable(%s, %s, %s, %s).' % (cond.entity.ID, cond.entity.version, cond.compartment.ID, base_model.ID)
 	# base model shouldn't have inactive activities or more than one version of any entity (would restrict derived models too, so OK)
-	strings.append('\n#example not not_clean_model(%s).' % base_model.ID)
-	return strings
+	yield '\n#example not not_clean_model(%s).' % base_model.ID
 
 
 def export_relevancy_results_revision(models_results):
-	strings = []
-	for model in models_results.keys():
-		for res in models_results[model]:
-			strings.append('\nrelevant(%s, %s).' % (res.ID, model.ID))
-			strings.append('\n#example not inconsistent(%s, %s).' % (model.ID, res.ID))
-	return strings
+	return list(iter_relevancy_results_revision(models_results))
+
+
+def iter_relevancy_results_revision(models_results):
+	for model in ordered(list(models_results.keys())):
+		for res in ordered(models_results[model]):
+			yield '\nrelevant(%s, %s).' % (res.ID, model.ID)
+			yield '\n#example not inconsistent(%s, %s).' % (model.ID, res.ID)
 
 
 def export_termination_conds_consistency(base_model):
-	strings = []
-	for cond in base_model.termination_conditions:
-		strings.append('\n:- not synthesizable(%s, %s, %s, %s).' % (cond.entity.ID, cond.entity.version, cond.compartment.ID, base_model.ID))
+	return list(iter_termination_conds_consistency(base_model))
+
+
+def iter_termination_conds_consistency(base_model):
+	for cond in ordered(base_model.termination_conditions):
+		yield '\n:- not synthesizable(%s, %s, %s, %s).' % (cond.entity.ID, cond.entity.version, cond.compartment.ID, base_model.ID)
 	# base model shouldn't have inactive activities or more than one version of any entity (would restrict derived models too, so OK)
-	strings.append('\n:- not_clean_model(%s).' % base_model.ID)
-	return strings
+	yield '\n:- not_clean_model(%s).' % base_model.ID
 
 
 def export_relevancy_results_consistency(models_results, base_model):
-	strings = []
-	for model in models_results.keys():
-		for res in models_results[model]:
+	return list(iter_relevancy_results_consistency(models_results, base_model))
+
+
+def iter_relevancy_results_consistency(models_results, base_model):
+	for model in ordered(list(models_results.keys())):
+		for res in ordered(models_results[model]):
 			if res in base_model.ignored_results:
 				continue
 			else:
-				strings.append('\nrelevant(%s, %s).' % (res.ID, model.ID))
-				strings.append('\n:- inconsistent(%s, %s).' % (model.ID, res.ID))
-	return strings
+				yield '\nrelevant(%s, %s).' % (res.ID, model.ID)
+				yield '\n:- inconsistent(%s, %s).' % (model.ID, res.ID)
+
+
+def export_consistency_batch(checks, delta=False, derived=False):
+	return list(iter_consistency_batch(checks, delta, derived))
+
+
+def iter_consistency_batch(checks, delta=False, derived=False):
+	# several base models checked in one program; checks: [(base_model, models_results)]
+	# failures are derived instead of being constraints: one answer set gives all verdicts (needs consistency_batch_rules())
+	models = [model for (base_model, models_results) in checks for model in ordered(list(models_results.keys()))]
+	if derived: # needs derived_models_rules()
+		yield ';'.join([x.ID for x in models]).join(['\nmodel(', ').'])
+		for (base_model, models_results) in checks:
+			yield from iter_derived_specification(ordered(list(models_results.keys())), base_model)
+	elif delta:
+		yield from iter_models_consensus_delta(models)
+	else:
+		yield ';'.join([x.ID for x in models]).join(['\nmodel(', ').'])
+		for model in models:
+			yield from iter_model_specification(model)
+	for (base_model, models_results) in checks:
+		for cond in ordered(base_model.termination_conditions):
+			yield '\nfailed(%s) :- not synthesizable(%s, %s, %s, %s).' % (base_model.ID, cond.entity.ID, cond.entity.version, cond.compartment.ID, base_model.ID)
+		yield '\nfailed(%s) :- not_clean_model(%s).' % (base_model.ID, base_model.ID)
+		for model in ordered(list(models_results.keys())):
+			for res in ordered(models_results[model]):
+				if res in base_model.ignored_results:
+					continue
+				yield '\nrelevant(%s, %s).' % (res.ID, model.ID)
+			yield '\nfailed(%s) :- inconsistent(%s, Result).' % (base_model.ID, model.ID)
+
+
+def export_revision_batch(revisions, ignoring, delta=False, penalties=None, derived=False):
+	return list(iter_revision_batch(revisions, ignoring, delta, penalties, derived))
+
+
+def iter_revision_batch(revisions, ignoring, delta=False, penalties=None, derived=False):
+	# several base models revised in one program; revisions: [(base_model, models_results, (add, remove, ignore candidates))]
+	# hypotheses are scoped by base model; derived models follow their base (needs revision_batch_rules())
+	models = [model for (base_model, models_results, candidates) in revisions for model in ordered(list(models_results.keys()))]
+	if derived: # needs derived_models_rules()
+		yield ';'.join([x.ID for x in models]).join(['\nmodel(', ').'])
+		for (base_model, models_results, candidates) in revisions:
+			yield from iter_derived_specification(ordered(list(models_results.keys())), base_model)
+	elif delta:
+		yield from iter_models_consensus_delta(models)
+	else:
+		yield ';'.join([x.ID for x in models]).join(['\nmodel(', ').'])
+		for model in models:
+			yield from iter_model_specification(model)
+	for (base_model, models_results, (add_act, rem_act, ign_res)) in revisions:
+		yield from iter_termination_conds_revision(base_model)
+		for model in ordered(list(models_results.keys())):
+			yield '\nbase_of(%s, %s).' % (model.ID, base_model.ID)
+		yield from iter_relevancy_results_revision(models_results)
+		for act in ordered(add_act):
+			yield '\n#modeh add(%s, %s) =%s @1.' % (act.ID, base_model.ID, act.add_cost)
+		for act in ordered(rem_act):
+			yield '\n#modeh remove(%s, %s) =%s @1.' % (act.ID, base_model.ID, act.remove_cost)
+		if ignoring:
+			for res in ordered(ign_res):
+				yield '\n#modeh ignored(%s, %s) =%s @2.' % (res.ID, base_model.ID, ignoring_penalty(res, penalties))
+
+
+def export_force_new_models_batch(base_models, external_models):
+	return list(iter_force_new_models_batch(base_models, external_models))
+
+
+def iter_force_new_models_batch(base_models, external_models):
+	# external models specified once; a base model isn't required to differ from an external model with its own activities
+	for model in ordered(external_models):
+		yield '\nexternal_model(%s).' % model.ID
+		for activity in ordered(model.intermediate_activities):
+			yield '\nin_model(%s,%s).' % (activity.ID, model.ID)
+	for base_model in base_models:
+		for model in ordered(external_models):
+			if model.intermediate_activities != base_model.intermediate_activities:
+				yield '\n#example different(%s, %s).' % (base_model.ID, model.ID)
+
+
+def revision_batch_rules():
+	return ['\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
+	'\n%%%%%% revision of several base models: scoped hypotheses %%%%%%',
+	'\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
+	'\n',
+	'\nremoved(ActivityOrCondition, Model) :-',
+	'\n	remove(ActivityOrCondition, Base),',
+	'\n	base_of(Model, Base).',
+	'\n',
+	'\nadded_to_model(ActivityOrCondition, Model) :-',
+	'\n	add(ActivityOrCondition, Base),',
+	'\n	base_of(Model, Base).'] + clean_model_rules() + [
+	'\n',
+	'\ninconsistent(Model, Result) :-',
+	'\n	predicts(Model, Experiment, Prediction),',
+	'\n	result(Result, Experiment, Outcome),',
+	'\n	Prediction != Outcome,',
+	'\n	relevant(Result, Model),',
+	'\n	base_of(Model, Base),',
+	'\n	not ignored(Result, Base).']
+
+
+def consistency_batch_rules():
+	return ['\n#hide.',
+	'\n#show failed/1.']
+
+
+#
+# compact results encoding: per-type tables with integer result IDs; relevance derived from intervention sets
+# (needs inconsistency_rules(compact_results=True))
+#
+
+def result_number(result): # res_N -> N
+	try:
+		return int(result.ID.split('res_')[1])
+	except (IndexError, ValueError):
+		raise ValueError("result_number: result ID not in res_<int> format: %s" % result.ID)
+
+
+def result_id(number): # N -> res_N (inverse of result_number)
+	return 'res_%s' % number
+
+
+def export_results_compact(results):
+	return list(iter_results_compact(results))
+
+
+def iter_results_compact(results):
+	for result in ordered(results):
+		N = result_number(result)
+		out = result.outcome
+		exp_type = result.exp_description.experiment_type
+		if isinstance(exp_type, exp_repr.ReconstructionTransporterRequired):
+			yield '\nres_transp_reconstruction(%s,%s,%s,%s).' % (N, exp_type.transport_activity_id, exp_type.transporter_id, out)
+		elif isinstance(exp_type, exp_repr.ReconstructionEnzReaction):
+			yield '\nres_enz_reconstruction(%s,%s,%s,%s).' % (N, exp_type.reaction_id, exp_type.enzyme_id, out)
+		elif isinstance(exp_type, exp_repr.ReconstructionActivity):
+			yield '\nres_basic_reconstruction(%s,%s,%s).' % (N, exp_type.activity_id, out)
+		elif isinstance(exp_type, exp_repr.AdamTwoFactorExperiment):
+			yield '\nres_adam_two_factor(%s,%s,%s,%s).' % (N, exp_type.gene_id, exp_type.metabolite_id, out)
+		elif isinstance(exp_type, exp_repr.DetectionActivity):
+			yield '\nres_detection_activity(%s,%s,%s).' % (N, exp_type.activity_id, out)
+		elif isinstance(exp_type, exp_repr.LocalisationEntity):
+			yield '\nres_localisation_entity(%s,%s,%s,%s).' % (N, exp_type.entity_id, exp_type.compartment_id, out)
+		elif isinstance(exp_type, exp_repr.DetectionEntity):
+			yield '\nres_detection_entity(%s,%s,%s).' % (N, exp_type.entity_id, out)
+		else:
+			raise TypeError('export_results_compact: result type not recognised:%s' % type(result))
+
+
+def export_relevancy_compact(models_results):
+	return list(iter_relevancy_compact(models_results))
+
+
+def iter_relevancy_compact(models_results):
+	# each (derived) model stands for one intervention set; results point to the set, not to models
+	counter = 0
+	for model in ordered(list(models_results.keys())):
+		yield '\nmodel_interventions(%s,%s).' % (model.ID, counter)
+		for res in ordered(models_results[model]):
+			yield '\nres_interventions(%s,%s).' % (result_number(res), counter)
+		counter += 1
+
+
+def export_examples_compact_revision(results):
+	return list(iter_examples_compact_revision(results))
+
+
+def iter_examples_compact_revision(results):
+	for res in ordered(results):
+		yield '\n#example not inconsistent(%s).' % result_number(res)
+
+
+def export_ignored_compact_consistency(base_model):
+	return list(iter_ignored_compact_consistency(base_model))
+
+
+def iter_ignored_compact_consistency(base_model):
+	for res in ordered(base_model.ignored_results):
+		yield '\nignored(%s).' % result_number(res)
+	yield '\n:- inconsistent(Model, Result).'
 
 
 def export_force_new_model(base_model, external_models):
-	strings = []
-	for model in external_models:
+	return list(iter_force_new_model(base_model, external_models))
+
+
+def iter_force_new_model(base_model, external_models):
+	for model in ordered(external_models):
 		# external model specification
-		strings.append('\nexternal_model(%s).' % model.ID)
-		for activity in model.intermediate_activities:
-			strings.append('\nin_model(%s,%s).' % (activity.ID, model.ID))
+		yield '\nexternal_model(%s).' % model.ID
+		for activity in ordered(model.intermediate_activities):
+			yield '\nin_model(%s,%s).' % (activity.ID, model.ID)
 		# constraint
-		strings.append('\n#example different(%s, %s).' % (base_model.ID, model.ID))
-	return strings
+		yield '\n#example different(%s, %s).' % (base_model.ID, model.ID)
 
 
 def export_add_activities(activities):
-	return ['\n#modeh add(%s) =%s @1.' % (act.ID, act.add_cost) for act in activities]
+	return list(iter_add_activities(activities))
+
+
+def iter_add_activities(activities):
+	return ('\n#modeh add(%s) =%s @1.' % (act.ID, act.add_cost) for act in ordered(activities))
 
 
 def export_remove_activities(activities):
-	return ['\n#modeh remove(%s) =%s @1.' % (act.ID, act.remove_cost) for act in activities]
+	return list(iter_remove_activities(activities))
+
+
+def iter_remove_activities(activities):
+	return ('\n#modeh remove(%s) =%s @1.' % (act.ID, act.remove_cost) for act in ordered(activities))
+
 
+def export_ignore_results(results, compact=False, penalties=None):
+	return list(iter_ignore_results(results, compact, penalties))
 
-def export_ignore_results(results):
-	return ['\n#modeh ignored(%s) =%s @2.' % (result.ID, result.exp_description.experiment_type.ignoring_penalty) for result in results]
+
+def iter_ignore_results(results, compact=False, penalties=None):
+	if compact: # integer result IDs
+		return ('\n#modeh ignored(%s) =%s @2.' % (result_number(result), ignoring_penalty(result, penalties)) for result in ordered(results))
+	return ('\n#modeh ignored(%s) =%s @2.' % (result.ID, ignoring_penalty(result, penalties)) for result in ordered(results))
+
+
+def export_revision_bound(add_act, rem_act, ign_res, bound, compact=False, penalties=None):
+	return list(iter_revision_bound(add_act, rem_act, ign_res, bound, compact, penalties))
+
+
+def iter_revision_bound(add_act, rem_act, ign_res, bound, compact=False, penalties=None):
+	# answers worse than bound (ignoring penalty, cost) ruled out, in the order of the optimisation
+	(penalty, cost) = bound
+	changes = ['add(%s)=%s' % (act.ID, act.add_cost) for act in ordered(add_act)] + ['remove(%s)=%s' % (act.ID, act.remove_cost) for act in ordered(rem_act)]
+	if compact: # integer result IDs
+		ignored = ['ignored(%s)=%s' % (result_number(res), ignoring_penalty(res, penalties)) for res in ordered(ign_res)]
+	else:
+		ignored = ['ignored(%s)=%s' % (res.ID, ignoring_penalty(res, penalties)) for res in ordered(ign_res)]
+	if ignored != []:
+		yield '\n:- %s #sum[%s].' % (penalty + 1, ', '.join(ignored))
+		if changes != []:
+			yield '\n:- %s #sum[%s], %s #sum[%s].' % (cost + 1, ', '.join(changes), penalty, ', '.join(ignored))
+	elif changes != []:
+		yield '\n:- %s #sum[%s].' % (cost + 1, ', '.join(changes))
+
+
+def ignoring_penalty(result, penalties=None): # penalties: result ID:penalty of the results it stands for (default: its own)
+	if (penalties != None) and (result.ID in penalties):
+		return penalties[result.ID]
+	return result.exp_description.experiment_type.ignoring_penalty
 
 
 def models_rules(max_number_activities):
@@ -352,6 +732,32 @@ def models_rules(max_number_activities):
 	'\n	not has_transporter(Activity, Model, Int).']
 
 
+def consensus_delta_rules():
+	return ['\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
+	'\n%%%%% consensus + delta model specification %%%%%',
+	'\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
+	'\nadded_to_model(ActivityOrSetup, Model) :-',
+	'\n	consensus(ActivityOrSetup),',
+	'\n	model(Model),',
+	'\n	not delta_removed(ActivityOrSetup, Model).',
+	'\n',
+	'\nadded_to_model(ActivityOrSetup, Model) :-',
+	'\n	delta_added(ActivityOrSetup, Model).']
+
+
+def derived_models_rules():
+	return ['\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
+	'\n%%%%% derived models from the base model %%%%%',
+	'\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
+	'\nadded_to_model(ActivityOrSetup, Model) :-',
+	'\n	derived_from(Model, Base),',
+	'\n	added_to_model(ActivityOrSetup, Base),',
+	'\n	not derived_removed(ActivityOrSetup, Model).',
+	'\n',
+	'\nadded_to_model(ActivityOrSetup, Model) :-',
+	'\n	derived_added(ActivityOrSetup, Model).']
+
+
 def predictions_rules():
 	return ['\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
 	'\n%%%%% prediction rules %%%%%',
@@ -563,11 +969,46 @@ def interventions_rules():
 	'\n	model(Model).']
 
 
-def inconsistency_rules():
+def inconsistency_rules(compact_results=False):
+	if compact_results:
+		return basic_inconsistency_rules() + compact_results_rules()
+	return basic_inconsistency_rules()
+
+
+def compact_results_rules():
+	return ['\n',
+	'\n% compact results: per-type tables, relevance from intervention sets',
+	'\nresult(Result, experiment(transp_reconstruction_exp, Activity, Entity), Outcome) :- res_transp_reconstruction(Result, Activity, Entity, Outcome).',
+	'\nresult(Result, experiment(enz_reconstruction_exp, Activity, Entity), Outcome) :- res_enz_reconstruction(Result, Activity, Entity, Outcome).',
+	'\nresult(Result, experiment(basic_reconstruction_exp, Activity), Outcome) :- res_basic_reconstruction(Result, Activity, Outcome).',
+	'\nresult(Result, experiment(adam_two_factor_exp, Gene, Metabolite), Outcome) :- res_adam_two_factor(Result, Gene, Metabolite, Outcome).',
+	'\nresult(Result, experiment(detection_activity_exp, Activity), Outcome) :- res_detection_activity(Result, Activity, Outcome).',
+	'\nresult(Result, experiment(localisation_entity_exp, Entity, Compartment), Outcome) :- res_localisation_entity(Result, Entity, Compartment, Outcome).',
+	'\nresult(Result, experiment(detection_entity_exp, Entity), Outcome) :- res_detection_entity(Result, Entity, Outcome).',
+	'\n',
+	'\nrelevant(Result, Model) :-',
+	'\n	res_interventions(Result, InterventionSet),',
+	'\n	model_interventions(Model, InterventionSet).',
+	'\n',
+	'\ninconsistent(Result) :-',
+	'\n	inconsistent(Model, Result).']
+
+
+def basic_inconsistency_rules():
 	return ['\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
 	'\n%%%%%% inconsistency between models and results - for revision %%%%%%',
-	'\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%',
+	'\n%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%'] + clean_model_rules() + [
 	'\n',
+	'\ninconsistent(Model, Result) :-',
+	'\n	predicts(Model, Experiment, Prediction),',
+	'\n	result(Result, Experiment, Outcome),',
+	'\n	Prediction != Outcome,',
+	'\n	relevant(Result, Model),',
+	'\n	not ignored(Result).']
+
+
+def clean_model_rules():
+	return ['\n',
 	'\nnot_clean_model(Model) :-',
 	'\n	activity(Activity),',
 	'\n	in_model(Activity, Model),',
@@ -576,14 +1017,7 @@ def inconsistency_rules():
 	'\nnot_clean_model(Model) :-',
 	'\n	involved(Entity, Version1, Model),',
 	'\n	involved(Entity, Version2, Model),',
-	'\n	Version1 != Version2.',
-	'\n',
-	'\ninconsistent(Model, Result) :-',
-	'\n	predicts(Model, Experiment, Prediction),',
-	'\n	result(Result, Experiment, Outcome),',
-	'\n	Prediction != Outcome,',
-	'\n	relevant(Result, Model),',
-	'\n	not ignored(Result).']
+	'\n	Version1 != Version2.']
 
 
 def model_difference_rules():
@@ -606,42 +1040,51 @@ def model_difference_rules():
 # additional stuff for experiment design:
 #
 
-def export_models_exp_design(models):
-	strings = []
+def export_models_exp_design(models, delta=False):
+	return list(iter_models_exp_design(models, delta))
+
+
+def iter_models_exp_design(models, delta=False):
+	if delta:
+		yield from iter_models_consensus_delta(models)
+		return
+	models = ordered(models)
 	# model().
 	joined_models = ';'.join([x.ID for x in models])
-	strings.append(joined_models.join(['\nmodel(', ').']))
+	yield joined_models.join(['\nmodel(', ').'])
 	# specification:
 	for model in models:
-		strings.extend(export_model_specification(model))
-
-	return strings
+		yield from iter_model_specification(model)
 
 
 def modeh_replacement(cost_model):
-	exp_spec_elements = [e for e in export_experiment_specification_elements(cost_model).keys()]
+	exp_spec_elements = [e for e in ordered(export_experiment_specification_elements(cost_model).keys())]
 	joined_elements = ','.join(exp_spec_elements)
 	return joined_elements.join(['\n0{', '}%s.' % len(exp_spec_elements)])
 
 
 def models_nr_and_probabilities(models):
-	out = []
+	return list(iter_models_nr_and_probabilities(models))
+
+
+def iter_models_nr_and_probabilities(models):
 	counter = 0
-	for model in models:
-		out.append('\nnr(%s,%s).' % (counter, model.ID))
-		out.append('\nprobability(%s, %s).' % (model.quality, model.ID))
+	for model in ordered(models):
+		yield '\nnr(%s,%s).' % (counter, model.ID)
+		yield '\nprobability(%s, %s).' % (model.quality, model.ID)
 		counter += 1
-	return out
 
 
 def cost_rules(cost_model):
-	output = []
+	return list(iter_cost_rules(cost_model))
+
+
+def iter_cost_rules(cost_model):
 	cost_dict = export_experiment_specification_elements(cost_model)
 	counter = 0
-	for element in cost_dict.keys():
-		output.append(''.join(['\ncost(%s, %s) :- ' % (cost_dict[element], counter), element, '.']))
+	for element in ordered(cost_dict.keys()):
+		yield ''.join(['\ncost(%s, %s) :- ' % (cost_dict[element], counter), element, '.'])
 		counter += 1
-	return output
 
 
 def ban_experiment(expDescription):
@@ -669,7 +1112,7 @@ def ban_experiment(expDescription):
 		raise TypeError("ban_experiment: exp description type not recognised: %s" % expDescription)
 
 	# dealing with interventions:
-	for inter in expDescription.interventions:
+	for inter in ordered(expDescription.interventions):
 		if (isinstance(inter, mnm_repr.Add) and isinstance(inter.condition_or_activity, mnm_repr.Condition)):
 			tpl = (inter.condition_or_activity.entity.ID, inter.condition_or_activity.entity.version, inter.condition_or_activity.compartment.ID)
 			exp_info.append('add(setup_present(%s, %s, %s))' % tpl)
@@ -747,7 +1190,6 @@ def export_experiment_specification_elements(cost_model):
 	return output
 
 
-
 def constant_for_calculating_score(Int):
 	return '\n\n#const n = %s.' % Int
 
@@ -779,7 +1221,6 @@ def design_constraints_basic():
 	'\n:- add(Activity), substrate(Ent,Ver,Comp,Activity), model(Model), not entity_in_model(Ent, Ver, Comp, Model).']
 
 
-
 def cost_minimisation_rules():
 	return ['\n\ntotal_cost(TCost) :- TCost = #sum[cost(Cost, Nr)=Cost].',
 	'\n#minimize[total_cost(TCost) = TCost@1].']
@@ -0,0 +1,381 @@
+#! /usr/bin/env python3
+# I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
+
+# In-process equivalent of exporter.models_rules(), exporter.predictions_rules() and exporter.inconsistency_rules():
+# computes what a model predicts without calling the ASP solver.
+
+import mnm_repr
+import exp_repr
+
+
+class ElementsIndex:
+	# facts about elements (the same as exported by prepare_input_elements), indexed by IDs
+	def __init__(self, entities, compartments):
+		self.compartments = set([comp.ID for comp in compartments])
+		self.genes = set()
+		self.metabolites = set()
+		self.entities = set() # (ID, version)
+		self.catalyses = {} # activity ID:set of (entity ID, version)
+		self.transports = {}
+		for ent in entities:
+			self.entities.add((ent.ID, ent.version))
+			if isinstance(ent, mnm_repr.Gene):
+				self.genes.add((ent.ID, ent.version))
+			elif isinstance(ent, mnm_repr.Metabolite):
+				self.metabolites.add((ent.ID, ent.version))
+			for prop in ent.properties:
+				if isinstance(prop, mnm_repr.Catalyses):
+					self.catalyses.setdefault(prop.activity.ID, set()).add((ent.ID, ent.version))
+				elif isinstance(prop, mnm_repr.Transports):
+					self.transports.setdefault(prop.activity.ID, set()).add((ent.ID, ent.version))
+
+
+class ModelSimulation:
+	# state of one model: active activities, synthesizable and involved entities
+	def __init__(self, model, index):
+		self.model = model
+		self.index = index
+		self.in_model = {} # activity ID:activity
+		for act in model.intermediate_activities:
+			self.in_model[act.ID] = act
+		self.setup = set([(cond.entity.ID, cond.entity.version, cond.compartment.ID) for cond in model.setup_conditions])
+
+		self.eliminated = self.eliminate()
+		self.active = set([a_id for a_id in self.in_model if (self.is_activity(self.in_model[a_id]) and not (a_id in self.eliminated))])
+
+		self.synthesizable = set()
+		for a_id in self.active:
+			self.synthesizable.update(self.products(self.in_model[a_id]))
+
+		self.involved = {} # entity ID:set of versions
+		for (ent, ver, comp) in self.setup:
+			if comp in self.index.compartments:
+				self.involved.setdefault(ent, set()).add(ver)
+		for act in self.in_model.values():
+			for (ent, ver, comp) in self.products(act) + self.substrates(act):
+				if comp in self.index.compartments:
+					self.involved.setdefault(ent, set()).add(ver)
+
+
+	def is_activity(self, act):
+		return (isinstance(act, mnm_repr.Reaction) or isinstance(act, mnm_repr.Transport) or isinstance(act, mnm_repr.Expression)
+			or isinstance(act, mnm_repr.ComplexFormation) or isinstance(act, mnm_repr.Growth))
+
+
+	def substrates(self, act):
+		return [(c.entity.ID, c.entity.version, c.compartment.ID) for c in act.required_conditions if isinstance(c, mnm_repr.PresentEntity)]
+
+
+	def products(self, act):
+		return [(c.entity.ID, c.entity.version, c.compartment.ID) for c in act.changes]
+
+
+	def enz_compartments(self, act):
+		return [c.compartment.ID for c in act.required_conditions if isinstance(c, mnm_repr.PresentCatalyst)]
+
+
+	def transp_compartments(self, act):
+		return [c.compartment.ID for c in act.required_conditions if isinstance(c, mnm_repr.PresentTransporter)]
+
+
+	def reachable(self, activities):
+		# path_back_to_initially_present: initially present or produced from something reachable
+		reach = set(self.setup)
+		changed = True
+		while changed:
+			changed = False
+			for act in activities:
+				if any([s in reach for s in self.substrates(act)]):
+					for prod in self.products(act):
+						if not (prod in reach):
+							reach.add(prod)
+							changed = True
+		return reach
+
+
+	def eliminate(self):
+		# iterations of activities elimination until nothing changes (eliminated sets grow monotonically,
+		# so the union over iterations in models_rules() is the fixpoint)
+		eliminated = set()
+		while True:
+			remaining = [act for (a_id, act) in self.in_model.items() if not (a_id in eliminated)]
+			reach = self.reachable(remaining)
+			new_eliminated = set()
+			for (a_id, act) in self.in_model.items():
+				if not self.is_activity(act):
+					continue
+				if not all([s in reach for s in self.substrates(act)]):
+					new_eliminated.add(a_id)
+				elif self.enz_compartments(act) and not self.has_helper(act, self.enz_compartments(act), self.index.catalyses, reach):
+					new_eliminated.add(a_id)
+				elif self.transp_compartments(act) and not self.has_helper(act, self.transp_compartments(act), self.index.transports, reach):
+					new_eliminated.add(a_id)
+			if new_eliminated == eliminated:
+				return eliminated
+			eliminated = new_eliminated
+
+
+	def has_helper(self, act, compartments, helpers, reach): # has_enzyme/has_transporter
+		for comp in compartments:
+			if not (comp in self.index.compartments):
+				continue
+			for (ent, ver) in helpers.get(act.ID, set()):
+				if (ent, ver, comp) in reach:
+					return True
+		return False
+
+
+	def is_clean(self): # not not_clean_model
+		if len(self.active) != len([act for act in self.in_model.values() if self.is_activity(act)]):
+			return False
+		return all([len(versions) < 2 for versions in self.involved.values()])
+
+
+	def is_synthesizable(self, condition):
+		return (condition.entity.ID, condition.entity.version, condition.compartment.ID) in self.synthesizable
+
+
+	def predictions(self, exp_type): # set of predicted outcomes: 'true', 'false'; empty if indifferent
+		# growth(dummy) is never in a model, so 'not predicts(detection_activity_exp(Growth), false)' always holds
+		if isinstance(exp_type, exp_repr.DetectionEntity):
+			return self.predict_detection_entity(exp_type.entity_id)
+		elif isinstance(exp_type, exp_repr.LocalisationEntity):
+			return self.predict_localisation_entity(exp_type.entity_id, exp_type.compartment_id)
+		elif isinstance(exp_type, exp_repr.DetectionActivity):
+			return self.predict_detection_activity(exp_type.activity_id)
+		elif isinstance(exp_type, exp_repr.AdamTwoFactorExperiment):
+			return self.predict_adam_two_factor(exp_type.gene_id, exp_type.metabolite_id)
+		elif isinstance(exp_type, exp_repr.ReconstructionActivity):
+			return self.predict_basic_reconstruction(exp_type.activity_id)
+		elif isinstance(exp_type, exp_repr.ReconstructionEnzReaction):
+			return self.predict_helper_reconstruction(exp_type.reaction_id, exp_type.enzyme_id, self.enz_compartments, self.index.catalyses)
+		elif isinstance(exp_type, exp_repr.ReconstructionTransporterRequired):
+			return self.predict_helper_reconstruction(exp_type.transport_activity_id, exp_type.transporter_id, self.transp_compartments, self.index.transports)
+		else:
+			raise TypeError("predictions: experiment type not recognised: %s" % type(exp_type))
+
+
+	def predict_detection_entity(self, ent):
+		# synthesized entities are involved too (products of activities in model)
+		if [x for x in (self.synthesizable | self.setup) if ((x[0] == ent) and (x[2] in self.index.compartments))]:
+			return set(['true'])
+		elif ent in self.involved:
+			return set(['false'])
+		else:
+			return set()
+
+
+	def predict_localisation_entity(self, ent, comp):
+		if not (comp in self.index.compartments):
+			return set()
+		if [x for x in (self.synthesizable | self.setup) if ((x[0] == ent) and (x[2] == comp))]:
+			return set(['true'])
+		elif ent in self.involved:
+			return set(['false'])
+		else:
+			return set()
+
+
+	def predict_detection_activity(self, a_id):
+		if not ((a_id in self.in_model) and self.is_activity(self.in_model[a_id])):
+			return set()
+		elif a_id in self.active:
+			return set(['true'])
+		else:
+			return set(['false'])
+
+
+	def predict_basic_reconstruction(self, a_id):
+		if not ((a_id in self.in_model) and self.is_activity(self.in_model[a_id])):
+			return set()
+		act = self.in_model[a_id]
+		if self.enz_compartments(act) or self.transp_compartments(act):
+			return set()
+		return set(['true'])
+
+
+	def predict_helper_reconstruction(self, a_id, ent, compartments, helpers):
+		if not ((a_id in self.in_model) and compartments(self.in_model[a_id])):
+			return set()
+		out = set()
+		helper_versions = set([ver for (e, ver) in helpers.get(a_id, set()) if e == ent])
+		for ver in self.involved.get(ent, set()):
+			if ver in helper_versions:
+				out.add('true')
+			elif helper_versions: # some other version would do that
+				out.add('false')
+		return out
+
+
+	def predict_adam_two_factor(self, gene, met):
+		if self.adam_two_factor_true(gene, met):
+			return set(['true'])
+		gene_involved = [ver for ver in self.involved.get(gene, set()) if ((gene, ver) in self.index.genes)]
+		met_involved = [ver for ver in self.involved.get(met, set()) if ((met, ver) in self.index.metabolites)]
+		if gene_involved and met_involved:
+			return set(['false'])
+		return set()
+
+
+	def adam_two_factor_true(self, gene, met):
+		if not [x for x in self.index.metabolites if x[0] == met]:
+			return False
+		for expression in self.in_model.values():
+			if not isinstance(expression, mnm_repr.Expression):
+				continue
+			if not [s for s in self.substrates(expression) if ((s[0] == gene) and (s[2] in self.index.compartments))]:
+				continue
+			# catalysts produced directly by the expression (connected compartments: the same compartment)
+			catalysts = set(self.products(expression))
+			# or produced down the line from expression products
+			downstream = set([x for x in self.downstream(self.products(expression)) if (((x[0], x[1]) in self.index.entities) and (x[2] in self.index.compartments))])
+			for (r_id, reaction) in self.in_model.items():
+				enz_comps = self.enz_compartments(reaction)
+				catalysed_by = self.index.catalyses.get(r_id, set())
+				direct = [x for x in catalysts if (((x[0], x[1]) in catalysed_by) and (x[2] in enz_comps) and (x[2] in self.index.compartments))]
+				indirect = [x for x in downstream if (((x[0], x[1]) in catalysed_by) and (x[2] in enz_comps))]
+				if not (direct or indirect):
+					continue
+				if [x for x in self.distance(reaction) if ((x[0] == met) and ((x[0], x[1]) in self.index.metabolites) and (x[2] in self.index.compartments))]:
+					return True
+		return False
+
+
+	def downstream(self, entities): # path_back_from_to: entities produced (in one or more steps) from given ones
+		reach = set()
+		front = set(entities)
+		while front:
+			new = set()
+			for act in self.in_model.values():
+				if [s for s in self.substrates(act) if s in front]:
+					new.update([p for p in self.products(act) if not (p in reach)])
+			reach.update(new)
+			front = new
+		return reach
+
+
+	def distance(self, reaction): # metabolites within distance 2 (metabolic reactions only) from the catalysed reaction
+		if not (isinstance(reaction, mnm_repr.Reaction) and self.enz_compartments(reaction)):
+			return set()
+		reach = set(self.products(reaction))
+		front = set(reach)
+		for step in range(2):
+			new = set()
+			for act in self.in_model.values():
+				if isinstance(act, mnm_repr.Reaction) and [s for s in self.substrates(act) if s in front]:
+					new.update(self.products(act))
+			front = new - reach
+			reach.update(new)
+		return reach
+
+
+	def inconsistent(self, result): # prediction different than the outcome (ignored results handled by caller)
+		outcome = str(result.outcome)
+		return [p for p in self.predictions(result.exp_description.experiment_type) if p != outcome] != []
+
+
+def consistent(base_model, models_results, index):
+	# the same as the consistency check program: termination conditions and clean base model, then
+	# no relevant, not ignored result inconsistent with the (derived) model it applies to
+	base_simulation = ModelSimulation(base_model, index)
+	for cond in base_model.termination_conditions:
+		if not base_simulation.is_synthesizable(cond):
+			return False
+	if not base_simulation.is_clean():
+		return False
+	for (model, results) in models_results.items():
+		results = [res for res in results if not (res in base_model.ignored_results)]
+		if results == []:
+			continue
+		if model is base_model:
+			simulation = base_simulation
+		else:
+			simulation = ModelSimulation(model, index)
+		for res in results:
+			if simulation.inconsistent(res):
+				return False
+	return True
+
+
+def violations(base_model, models_results, index): # -> (unmet termination conditions and unclean base model, inconsistent results)
+	# what the revision program has to fix (no results ignored)
+	base_simulation = ModelSimulation(base_model, index)
+	structural = len([cond for cond in base_model.termination_conditions if not base_simulation.is_synthesizable(cond)])
+	if not base_simulation.is_clean():
+		structural += 1
+	inconsistent = []
+	for (model, results) in models_results.items():
+		if results == []:
+			continue
+		if model is base_model:
+			simulation = base_simulation
+		else:
+			simulation = ModelSimulation(model, index)
+		inconsistent.extend([res for res in results if simulation.inconsistent(res)])
+	return (structural, inconsistent)
+
+
+def result_elements(result): # entities and activities an experiment (with its interventions) is about: ('entity'|'activity', ID)
+	elements = set()
+	exp_type = result.exp_description.experiment_type
+	for attribute in ['entity_id', 'gene_id', 'metabolite_id', 'enzyme_id', 'transporter_id']:
+		if hasattr(exp_type, attribute):
+			elements.add(('entity', getattr(exp_type, attribute)))
+	for attribute in ['activity_id', 'reaction_id', 'transport_activity_id']:
+		if hasattr(exp_type, attribute):
+			elements.add(('activity', getattr(exp_type, attribute)))
+	for intervention in result.exp_description.interventions:
+		element = intervention.condition_or_activity
+		if isinstance(element, mnm_repr.Activity):
+			elements.add(('activity', element.ID))
+		elif isinstance(element, mnm_repr.PresentEntity):
+			elements.add(('entity', element.entity.ID))
+	return elements
+
+
+def activity_neighbours(act, index): # entities (by ID) an activity is connected to: substrates, products, catalysts, transporters
+	entities = [c.entity.ID for c in act.required_conditions if isinstance(c, mnm_repr.PresentEntity)] + [c.entity.ID for c in act.changes]
+	entities.extend([ent for (ent, ver) in index.catalyses.get(act.ID, set()) | index.transports.get(act.ID, set())])
+	return set([('entity', ent) for ent in entities])
+
+
+def related_elements(activities, index, seeds):
+	# elements connected to seeds through substrates, products, catalysts and transporters (entities by ID, so
+	# that versions are related too); changes outside of them can't change predictions about the seeds
+	neighbours = {}
+	for act in activities:
+		act_node = ('activity', act.ID)
+		for ent_node in activity_neighbours(act, index):
+			neighbours.setdefault(act_node, set()).add(ent_node)
+			neighbours.setdefault(ent_node, set()).add(act_node)
+	related = set(seeds)
+	front = list(seeds)
+	while front:
+		node = front.pop()
+		for neighbour in neighbours.get(node, set()):
+			if not (neighbour in related):
+				related.add(neighbour)
+				front.append(neighbour)
+	return related
+
+
+def components(activities, index, groups): # -> node:representative node of its component (nodes not given are alone)
+	# connected parts of the graph of related_elements(); elements of each group (e.g. what one result is about)
+	# end up in the same part
+	parent = {}
+	def find(node):
+		root = parent.setdefault(node, node)
+		while parent[root] != root:
+			root = parent[root]
+		while parent[node] != root:
+			(parent[node], node) = (root, parent[node])
+		return root
+	def union(nodes):
+		roots = [find(node) for node in nodes]
+		for root in roots[1:]:
+			parent[root] = roots[0]
+	for act in activities:
+		union([('activity', act.ID)] + sorted(activity_neighbours(act, index)))
+	for group in groups:
+		union(sorted(group))
+	return dict([(node, find(node)) for node in parent])
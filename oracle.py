@@ -107,9 +107,8 @@ class Oracle:
 
 	def write_and_execute(self, inp):
 		# try: remove the file
-		with open(self.work_file, 'w') as f:
-			for string in inp:
-				read_data = f.write(string)
+		with open(self.work_file, 'wb') as f:
+			exporter.write_program(f, [inp])
 		# could suppress there warnig messages later on
 		gringo = subprocess.Popen(['gringo', self.work_file], stdout=subprocess.PIPE)
 		clasp = subprocess.Popen(['clasp', '-n', '0'], stdin=gringo.stdout, stdout=subprocess.PIPE)
@@ -2,46 +2,275 @@
 # I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
 
 import exporter
+from export_session import ExportSession
+from derivation_index import DerivationIndex
+import model_simulator
 
-from archive import RefutedModels, RevisedModel, RevisionFail, AdditionalModels, AdditModProdFail, RevisedIgnoredUpdate, RedundantModel
+from archive import RefutedModels, RevisedModel, RevisionFail, AdditionalModels, AdditModProdFail, RevisedIgnoredUpdate, RedundantModel, RevisionTruncated, ChosenExperiment, AcceptedResults
 import archive
 from copy import copy
+from itertools import chain, product
+from threading import Timer, Lock
+from multiprocessing import Pool
 import subprocess
+import os
+import signal
 import mnm_repr
+import exp_repr
 import re
 import random
-from time import gmtime
+from time import gmtime, time
+
+
+_worker_module = None # copy of the revision module in a worker process (see check_and_revise_parallel)
+_worker_models = []
+
+
+def init_worker(module, models): # pickled together: models share results and elements with module.archive
+	global _worker_module, _worker_models
+	_worker_module = module
+	_worker_models = models
+	module.work_file_template = module.work_file + '_task%s'
+	module.processes = 1 # no pools within workers
+	signal.signal(signal.SIGTERM, stop_worker)
+
+
+def stop_worker(signum, frame): # pool terminated (e.g. discarded speculation): solvers in their own process groups stopped too
+	for process in list(_worker_module.solvers):
+		_worker_module.kill_solver(process)
+	signal.signal(signal.SIGTERM, signal.SIG_DFL)
+	os.kill(os.getpid(), signal.SIGTERM)
+
+
+def check_and_revise_task(task): # (model number, number of results already verified) -> (consistent, raw solutions, truncation)
+	(number, verified_results) = task
+	module = _worker_module
+	model = _worker_models[number]
+	module.work_file = module.work_file_template % number # per-task work file
+	if module.check_consistency_against(model, module.extract_results()[verified_results:]):
+		return (True, None, None)
+	module.truncation = None # recorded in the archive of the main process
+	solutions = module.prepare_input_and_execute(model, module.ignoring, False)
+	return (False, solutions, module.truncation)
+
+
+def revise_part_task(task): # (part number, sub-model, ignoring, candidates, results) -> (raw solutions, truncation)
+	(number, model, ignoring, candidates, results) = task
+	module = _worker_module
+	module.work_file = module.work_file_template % number
+	module.truncation = None
+	solutions = module.execute_revision(model, ignoring, False, candidates, results)
+	return (solutions, module.truncation)
+
+
+WARM_START_SIZE = 20 # optimal structures remembered per lineage
+
+
+def warm_start_key(model):
+	return (model.setup_conditions, model.intermediate_activities, model.termination_conditions)
+
+
+def hamming(bits1, bits2): # number of activities in which two models (as bitsets) differ
+	return bin(bits1 ^ bits2).count('1')
+
+
+def iter_answers(lines): # lines of each complete answer in XHAIL output ('Answer' up to an empty line and an escape code)
+	answer = None
+	for line in lines:
+		line = line.rstrip('\n')
+		if (answer != None) and (answer[-1] == '') and line.startswith('\x1b'):
+			yield answer
+			answer = None
+			line = line[1:] # the next answer may start on the same line
+		if answer == None:
+			if 'Answer' in line:
+				answer = [line[line.index('Answer'):]]
+		else:
+			answer.append(line)
+
 
 class RevisionModule:
-	def __init__(self, archive, xhail="/usr/local/xhail-0.5.1/xhail.jar", gringo="/usr/local/xhail-0.5.1/gringo", clasp="/usr/local/xhail-0.5.1/clasp", sfx=""):
+	ignoring = False # revision may ignore results instead of changing the model
+
+	def __init__(self, archive, xhail="/usr/local/xhail-0.5.1/xhail.jar", gringo="/usr/local/xhail-0.5.1/gringo", clasp="/usr/local/xhail-0.5.1/clasp", sfx="", delta_models=False, incremental_export=False, compact_results=False, consistency_check='engine', incremental_consistency=False, processes=1, revision_cache=False, reservoir_size=0, prune_candidates=False, derivation_index=False, exclude_refuted=False, batch_revision=0, max_solutions=None, time_budget=None, random_candidates=1, decompose=False, reduce_results=False, diverse_models=False, min_distance=0, warm_start=False, derived_as_rules=False, speculate=False):
 		self.archive = archive
 		self.xhail = xhail
 		self.gringo = gringo
 		self.clasp = clasp
 		self.work_file = './temp/workfile_xhail_%s' % sfx # adds suffix specific for the task (required for multiprocessing)
+		self.delta_models = delta_models # export derived models as consensus (base model) + deltas
+		self.derived_as_rules = derived_as_rules # export derived models as changes to their base model, derived by rules (instead of delta_models)
+		self.export_session = None
+		if incremental_export: # elements and results kept up to date between cycles
+			self.export_session = ExportSession(archive)
+		self.compact_results = compact_results # results as per-type tables with integer IDs; relevance derived by rules
+		if not (consistency_check in ['engine', 'xhail', 'verify', 'batch']):
+			raise ValueError('consistency_check not recognised: %s' % consistency_check)
+		# engine: in-process; xhail: ASP program per model; verify: both, XHAIL decides; batch: one ASP program for all models
+		self.consistency_check = consistency_check
+		self._elements_index = None
+		self._elements_index_key = None
+		self.incremental_consistency = incremental_consistency # re-check consistent models only against new results
+		self.verified = {} # (id(model), model.ID):(model, number of results checked, ignored results at the time)
+		self.processes = processes # more than 1: working models checked and revised in a process pool
+		self.revision_cache = None # fingerprint of revision input:raw solutions; emptied when new results arrive
+		if revision_cache:
+			self.revision_cache = {}
+		self._revision_cache_results = 0
+		self.reservoir_size = reservoir_size # unused optimal revisions kept for produce_additional_models (0: none)
+		self.reservoir = []
+		self._reservoir_results = 0
+		self.prune_candidates = prune_candidates # offer XHAIL only changes related to what is violated
+		self.derivation_index = None # results grouped by interventions and derived models kept between cycles
+		if derivation_index:
+			self.derivation_index = DerivationIndex(archive)
+		self.exclude_refuted = exclude_refuted # structures of refuted models (archive.model_registry) never proposed again
+		self.batch_revision = batch_revision # more than 1: up to that many inconsistent models revised in one XHAIL call
+		self.max_solutions = max_solutions # XHAIL output read only until that many optimal answers arrived (None: all)
+		self.time_budget = time_budget # seconds per revision call; solutions found until then are returned (None: no limit)
+		self.truncation = None # (reason, optimality proven) if the last revision call was stopped early
+		self.random_candidates = random_candidates # random additional models drawn; the one closest to consistency is used
+		self.decompose = decompose # independent parts of the network with violations revised separately (see execute_revision_decomposed)
+		self.reduce_results = reduce_results # results with the same experiment description and outcome exported once (see reduced_results)
+		self.diverse_models = diverse_models # of optimal revisions, the one differing most from other working models is used
+		self.min_distance = min_distance # additional models differing in fewer activities from a working model are not recorded
+		self._activity_bits = {} # activity:bit of model bitsets (see activity_bits)
+		self.warm_start = warm_start # optima found earlier in a model's lineage bound the revision program (see execute_revision_warm_started)
+		self.warm_starts = {} # (setup, activities, termination):activities of optimal revisions in the lineage, latest first
+		if decompose and warm_start: # bounds are known for whole models only, not for their parts
+			raise ValueError('decompose and warm_start not supported together')
+		self._speculation = None # (number of known results, models, outcome:(hypothetical result, pool, outputs)); see start_speculation
+		self.solvers = [] # running solver processes, each in its own process group (see stop_worker)
+		if speculate: # working models checked and revised for both outcomes of a chosen experiment while it's executed
+			archive.subscribe(self)
+
+
+	def __getstate__(self): # speculation pools stay with the process that started them
+		state = self.__dict__.copy()
+		state['_speculation'] = None
+		state['solvers'] = []
+		return state
+
+
+	def notify(self, event):
+		if isinstance(event, ChosenExperiment):
+			self.start_speculation(event.experiment_descriptions)
+		elif isinstance(event, AcceptedResults):
+			self.settle_speculation(event.experiment)
+		else:
+			pass
+
 
+	def start_speculation(self, exp_descriptions): # background pool per outcome: outputs as check_and_revise_parallel's
+		self.stop_speculation()
+		if len(exp_descriptions) != 1: # outcomes of several experiments: too many branches
+			return
+		(exp_id, res_id) = self.archive.next_ids()
+		models = sorted(self.archive.working_models, key=exporter.stable_key)
+		branches = {}
+		for outcome in ['true', 'false']:
+			result = exp_repr.Result(res_id, exp_descriptions[0], outcome)
+			module = self.hypothetical_module(exp_repr.Experiment(exp_id, [result]), outcome)
+			pool = Pool(processes=max(1, self.processes // 2), initializer=init_worker, initargs=(module, models))
+			branches[outcome] = (result, pool, pool.map_async(check_and_revise_task, [(number, 0) for number in range(len(models))]))
+		self._speculation = (len(self.archive.known_results), models, branches)
+
+
+	def hypothetical_module(self, experiment, outcome): # copy of the module as if the experiment were accepted
+		module = copy(self)
+		module.archive = copy(self.archive) # listeners dropped when pickled for the workers
+		module.archive.known_results = self.archive.known_results + [experiment]
+		module.work_file = '%s_%s' % (self.work_file, outcome)
+		module.export_session = None # caches of the real archive
+		module.derivation_index = None
+		module.revision_cache = None
+		module.verified = {}
+		return module
+
+
+	def settle_speculation(self, experiment): # branch of the accepted result kept, others stopped
+		if self._speculation == None:
+			return
+		(number_results, models, branches) = self._speculation
+		results = list(experiment.results)
+		kept = {}
+		if (len(results) == 1) and (len(self.archive.known_results) == number_results + 1):
+			kept = dict([(outcome, branch) for (outcome, branch) in branches.items() if (branch[0].ID == results[0].ID) and (branch[0].exp_description == results[0].exp_description) and (branch[0].outcome == results[0].outcome)])
+		for (outcome, (result, pool, outputs)) in branches.items():
+			if not (outcome in kept):
+				pool.terminate()
+		self._speculation = None
+		if kept != {}:
+			self._speculation = (number_results, models, kept)
+
+
+	def stop_speculation(self):
+		if self._speculation != None:
+			for (result, pool, outputs) in self._speculation[2].values():
+				pool.terminate()
+		self._speculation = None
+
+
+	def speculative_outputs(self): # -> (models, outputs) of the settled branch if nothing changed since; None otherwise
+		if (self._speculation == None) or (len(self._speculation[2]) != 1):
+			self.stop_speculation()
+			return None
+		(number_results, models, branches) = self._speculation
+		working = sorted(self.archive.working_models, key=exporter.stable_key)
+		if (len(self.archive.known_results) != number_results + 1) or ([id(mod) for mod in working] != [id(mod) for mod in models]):
+			self.stop_speculation()
+			return None
+		self._speculation = None
+		(result, pool, outputs) = list(branches.values())[0]
+		outputs = outputs.get()
+		pool.close()
+		pool.join()
+		return (models, outputs)
 
 	def test_and_revise_all(self):
-		inconsistent_models = []
-		for model in self.archive.working_models:
-			if not self.check_consistency(model):
-				inconsistent_models.append(model)
-			else:
-				pass
+		if self.incremental_consistency: # forget models that are no longer working
+			working = set([(id(mod), mod.ID) for mod in self.archive.working_models])
+			self.verified = dict([(key, val) for (key, val) in self.verified.items() if key in working])
+		solutions = None
+		speculated = self.speculative_outputs()
+		if speculated != None: # computed while the experiment was executed
+			(models, outputs) = speculated
+			self.accept_outputs(models, outputs)
+			inconsistent_models = [model for (model, out) in zip(models, outputs) if not out[0]]
+			solutions = [out[1] for out in outputs if not out[0]]
+			truncations = [out[2] for out in outputs if not out[0]]
+		elif self.processes > 1: # raw solutions computed in parallel; events recorded in a fixed order
+			models = sorted(self.archive.working_models, key=exporter.stable_key)
+			outputs = self.check_and_revise_parallel(models)
+			inconsistent_models = [model for (model, out) in zip(models, outputs) if not out[0]]
+			solutions = [out[1] for out in outputs if not out[0]]
+			truncations = [out[2] for out in outputs if not out[0]]
+		else:
+			models = list(self.archive.working_models)
+			inconsistent_models = [model for (model, consistent) in zip(models, self.check_consistency_all(models)) if not consistent]
+			if (self.batch_revision > 1) and (len(inconsistent_models) > 1):
+				(solutions, truncations) = self.prepare_input_and_execute_batch(inconsistent_models, self.ignoring)
 
+		activities_from_current_models = set([mod.intermediate_activities for mod in self.archive.working_models])
 		revision_events = []
 		update_events = []
 		updated_ignoring_models = []
+		kept_models = []
 		redundant_model_created_events = []
-		for model in inconsistent_models:
-			out = self.revise(model) #(new_mods, updated_base_model)
+		for (number, model) in enumerate(inconsistent_models):
+			if solutions == None:
+				out = self.revise(model) #(new_mods, updated_base_model)
+			else:
+				out = self.process_revision_solutions(model, solutions[number], truncations[number])
 			if out == False: # in this case: there is no other consistent model
 				self.archive.record(RevisionFail())
 				break
 			else:
+				if (out[0] == []) and (out[1] == False): # no answer found in time: kept as it is, revised in a later cycle
+					kept_models.append(model)
+
 				if (out[0] != []): # new_mods
 					# check if new model redundant:
-					activities_from_current_models = [mod.intermediate_activities for mod in self.archive.working_models]
 					non_redundant_new_models = []
 					for new_model in out[0]:
 						if new_model.intermediate_activities in activities_from_current_models: # is redundant (set of activities identical to some other model)
@@ -55,25 +284,164 @@ class RevisionModule:
 					updated_ignoring_models.append(model)
 
 		# record refuted (revision required change in model's structure, not just in set of ignored results)
-		self.archive.record(RefutedModels(list(set(inconsistent_models) - set(updated_ignoring_models))))
+		self.archive.record(RefutedModels(list(set(inconsistent_models) - set(updated_ignoring_models) - set(kept_models))))
 		# record revision/update events
 		for event in revision_events + update_events + redundant_model_created_events:
 			self.archive.record(event)
 
 
+	def check_and_revise_parallel(self, models): # -> [(consistent, raw solutions or None, truncation)] in order of models
+		all_results = self.extract_results()
+		tasks = [(number, len(all_results) - len(self.unverified_results(model, all_results))) for (number, model) in enumerate(models)]
+		with Pool(processes=self.processes, initializer=init_worker, initargs=(self, models)) as pool:
+			outputs = pool.map(check_and_revise_task, tasks)
+		self.accept_outputs(models, outputs)
+		return outputs
+
+
+	def accept_outputs(self, models, outputs): # outputs of check_and_revise_task, computed in workers
+		number_results = len(self.extract_results())
+		for (model, out) in zip(models, outputs):
+			if out[0]:
+				self.remember_verified(model, number_results)
+			else: # solved in a worker
+				self.truncation = out[2]
+				self.remember_revision(model, self.ignoring, False, out[1])
+
+
 	def check_consistency(self, model):
-		res_mods = self.prepare_input_results_models_consistency(model)
+		return self.check_consistency_all([model])[0]
+
+
+	def check_consistency_all(self, models): # -> [consistent] in order of models
+		all_results = self.extract_results()
+		checks = [(model, self.unverified_results(model, all_results)) for model in models]
+		if self.consistency_check == 'batch':
+			outcomes = self.check_consistency_batch(checks)
+		else:
+			outcomes = [self.check_consistency_against(model, results) for (model, results) in checks]
+		for (model, outcome) in zip(models, outcomes):
+			if outcome:
+				self.remember_verified(model, len(all_results))
+		return outcomes
+
+
+	def check_consistency_against(self, model, results):
+		if self.consistency_check == 'batch':
+			return self.check_consistency_batch([(model, results)])[0]
+		if self.reduce_results:
+			results = self.consistency_results(model, results)
+		if self.consistency_check == 'xhail':
+			outcome = self.check_consistency_xhail(model, results)
+		else:
+			outcome = self.check_consistency_engine(model, results)
+			if self.consistency_check == 'verify':
+				xhail_outcome = self.check_consistency_xhail(model, results)
+				if outcome != xhail_outcome:
+					print('consistency check: engine and XHAIL disagree for model %s (engine: %s, XHAIL: %s)' % (model.ID, outcome, xhail_outcome))
+				outcome = xhail_outcome
+		return outcome
+
+
+	def consistency_results(self, model, results): # results that can make the model inconsistent, duplicates left out
+		return self.reduced_results([res for res in results if not (res in model.ignored_results)])[0]
+
+
+	def reduced_results(self, results): # -> (representatives, representative ID:IDs of results it stands for, representative ID:ignoring penalty)
+		# results with the same experiment description and outcome (e.g. repeated experiments) are the same to the
+		# programs: the first one of each stands for all of them; ignoring it costs as much as ignoring all of them
+		groups = {}
+		representatives = []
+		for res in results:
+			key = (res.exp_description, res.outcome)
+			if not (key in groups):
+				groups[key] = []
+				representatives.append(res)
+			groups[key].append(res)
+		members = dict([(group[0].ID, [res.ID for res in group]) for group in groups.values()])
+		penalties = dict([(group[0].ID, sum([res.exp_description.experiment_type.ignoring_penalty for res in group])) for group in groups.values()])
+		return (representatives, members, penalties)
+
+
+	def expand_solutions(self, solutions, members): # covered and ignored representatives replaced by the results they stand for
+		expand = lambda res_ids: [member for res_id in res_ids for member in members.get(res_id, [res_id])]
+		return [(sol[0], sol[1], expand(sol[2]), expand(sol[3])) for sol in solutions]
+
+
+	def remember_verified(self, model, number_results):
+		if self.incremental_consistency:
+			self.verified[(id(model), model.ID)] = (model, number_results, model.ignored_results)
+
+
+	def unverified_results(self, model, results):
+		# results added since the model was last found consistent; all of them if its ignored results changed
+		if not self.incremental_consistency:
+			return results
+		entry = self.verified.get((id(model), model.ID))
+		if (entry == None) or not (entry[0] is model) or (entry[2] != model.ignored_results) or (entry[1] > len(results)):
+			return results
+		return results[entry[1]:]
+
+
+	def check_consistency_engine(self, model, results=None):
+		if results == None:
+			results = self.extract_results()
+		models_results = self.make_derivative_models(model, results)
+		return model_simulator.consistent(model, models_results, self.elements_index())
+
+
+	def elements_index(self):
+		# elements are set up before development starts; re-indexed only if their number changed
+		key = (len(self.archive.mnm_entities), len(self.archive.mnm_compartments))
+		if key != self._elements_index_key:
+			self._elements_index = model_simulator.ElementsIndex(self.archive.mnm_entities, self.archive.mnm_compartments)
+			self._elements_index_key = key
+		return self._elements_index
+
+
+	def check_consistency_xhail(self, model, results=None):
+		res_mods = self.prepare_input_results_models_consistency(model, results)
 		max_number_activities = self.calculate_max_number_activities(model)
 		mod_rules = exporter.models_rules(max_number_activities)
 		pred_rules = exporter.predictions_rules()
-		incons_rules = exporter.inconsistency_rules()
-		inpt = [res_mods, mod_rules, pred_rules, incons_rules]
-		inpt = [val for sublist in inpt for val in sublist] # flatten
+		incons_rules = exporter.inconsistency_rules(self.compact_results)
+		inpt = chain(res_mods, mod_rules, pred_rules, incons_rules) # streamed, not flattened
 		raw_output = self.write_and_execute_xhail(inpt)
 		outcome = self.process_output_consistency(raw_output)	
 		return outcome
 
 
+	def check_consistency_batch(self, checks): # [(model, results)] -> [consistent]; one deductive solver call
+		if checks == []: # no program to solve
+			return []
+		if self.reduce_results:
+			checks = [(model, self.consistency_results(model, model_results)) for (model, model_results) in checks]
+		exped_elements = self.prepare_input_elements()
+		results = set()
+		for (model, model_results) in checks:
+			results.update(model_results)
+		exped_results = exporter.iter_results(exporter.ordered(list(results))) # standard encoding: ignored results differ per model
+		batch = [(model, self.make_derivative_models(model, model_results)) for (model, model_results) in checks]
+		exped_checks = exporter.iter_consistency_batch(batch, self.delta_models, self.derived_as_rules)
+		if self.derived_as_rules:
+			exped_checks = chain(exped_checks, exporter.derived_models_rules())
+		elif self.delta_models:
+			exped_checks = chain(exped_checks, exporter.consensus_delta_rules())
+		max_number_activities = self.calculate_max_number_activities(None)
+		rules = chain(exporter.models_rules(max_number_activities), exporter.predictions_rules(), exporter.inconsistency_rules(), exporter.consistency_batch_rules())
+		raw_output = self.write_and_execute_gringo_clasp(chain(exped_elements, exped_results, exped_checks, rules))
+		return self.process_output_consistency_batch(raw_output, [model for (model, model_results) in checks])
+
+
+	def process_output_consistency_batch(self, output, models):
+		strings = output.split('\n')
+		answers = [strings[number + 1] for number in range(len(strings) - 1) if strings[number].startswith('Answer: ')]
+		if answers == []:
+			raise ValueError('check_consistency_batch: solver failed: %s' % output)
+		failed = re.findall('failed\\((.*?)\\)', answers[0])
+		return [not (model.ID in failed) for model in models]
+
+
 	def calculate_max_number_activities(self, model):
 		max_number_activities = len(self.archive.mnm_activities)
 		if max_number_activities < 4:
@@ -82,45 +450,68 @@ class RevisionModule:
 			return max_number_activities
 
 
-	def prepare_input_results_models_consistency(self, base_model):
+	def prepare_input_results_models_consistency(self, base_model, results=None):
 		exped_elements = self.prepare_input_elements()
-		exped_deriv_mods, models_results = self.prepare_input_deriv_mods_and_results(base_model)
-		exped_term = exporter.export_termination_conds_consistency(base_model) # base_model() and termination conds
-		exped_results = exporter.export_relevancy_results_consistency(models_results, base_model) # relevancy info, :- inconsistent()
-		output = [exped_elements, exped_deriv_mods, exped_term, exped_results]
-		output = [val for sublist in output for val in sublist]
-		return output
+		exped_deriv_mods, models_results = self.prepare_input_deriv_mods_and_results(base_model, results)
+		exped_term = exporter.iter_termination_conds_consistency(base_model) # base_model() and termination conds
+		if self.compact_results: # intervention sets of models, ignored results, :- inconsistent()
+			exped_results = chain(exporter.iter_relevancy_compact(models_results), exporter.iter_ignored_compact_consistency(base_model))
+		else:
+			exped_results = exporter.iter_relevancy_results_consistency(models_results, base_model) # relevancy info, :- inconsistent()
+		return chain(exped_elements, exped_deriv_mods, exped_term, exped_results)
 
 
-	def prepare_input_results_models_revision(self, base_model):
+	def prepare_input_results_models_revision(self, base_model, results=None):
 		exped_elements = self.prepare_input_elements()
-		exped_deriv_mods, models_results = self.prepare_input_deriv_mods_and_results(base_model)
-		exped_term = exporter.export_termination_conds_revision(base_model) # base_model() and termination conds
-		exped_results = exporter.export_relevancy_results_revision(models_results) # relevancy info, #example not inconsistent()
-		output = [exped_elements, exped_deriv_mods, exped_term, exped_results]
-		output = [val for sublist in output for val in sublist]
-		return output
+		exped_deriv_mods, models_results = self.prepare_input_deriv_mods_and_results(base_model, results)
+		exped_term = exporter.iter_termination_conds_revision(base_model) # base_model() and termination conds
+		if self.compact_results: # intervention sets of models, #example not inconsistent() per result
+			results = [val for sublist in models_results.values() for val in sublist]
+			exped_results = chain(exporter.iter_relevancy_compact(models_results), exporter.iter_examples_compact_revision(results))
+		else:
+			exped_results = exporter.iter_relevancy_results_revision(models_results) # relevancy info, #example not inconsistent()
+		return chain(exped_elements, exped_deriv_mods, exped_term, exped_results)
 
 
 	def prepare_input_elements(self):
-		exped_entities = exporter.export_entities(self.archive.mnm_entities)
+		if self.export_session != None:
+			return self.export_session.export_elements()
+		exped_entities = exporter.iter_entities(self.archive.mnm_entities)
 		exped_compartments = exporter.export_compartments(self.archive.mnm_compartments)
-		exped_activities = exporter.export_activities(self.archive.mnm_activities + self.archive.import_activities)
-		output = [exped_entities, exped_compartments, exped_activities] # not flattened
-		return [val for sublist in output for val in sublist] # flattened
+		exped_activities = exporter.iter_activities(self.archive.mnm_activities + self.archive.import_activities)
+		return chain(exped_entities, exped_compartments, exped_activities)
 
 
-	def prepare_input_deriv_mods_and_results(self, base_model):
+	def extract_results(self):
+		if self.export_session != None:
+			return list(self.export_session.results)
 		extracted_results = [exp.results for exp in self.archive.known_results] # not flattened
-		extracted_results = [val for sublist in extracted_results for val in sublist] # flattened
+		return [val for sublist in extracted_results for val in sublist] # flattened
+
+
+	def prepare_input_deriv_mods_and_results(self, base_model, results=None):
+		# results: subset of known results to check against (default: all)
+		if results == None:
+			extracted_results = self.extract_results()
+		else:
+			extracted_results = results
+
+		if self.compact_results:
+			exped_results = exporter.iter_results_compact(extracted_results)
+		elif (self.export_session != None) and (results == None):
+			exped_results = self.export_session.export_results()
+		else:
+			exped_results = exporter.iter_results(extracted_results)
 
-		exped_results = exporter.export_results(extracted_results)
 		models_results = self.make_derivative_models(base_model, extracted_results)
-		exped_models = exporter.export_models(models_results) # specification and model()
+		if self.derived_as_rules:
+			exped_models = chain(exporter.iter_models_derived(models_results.keys(), base_model), exporter.derived_models_rules())
+		else:
+			exped_models = exporter.iter_models(models_results, self.delta_models) # specification and model()
+			if self.delta_models:
+				exped_models = chain(exped_models, exporter.consensus_delta_rules())
 
-		out = [exped_results, exped_models] # not flattened
-		out = [val for sublist in out for val in sublist] # flattened
-		return (out, models_results)
+		return (chain(exped_results, exped_models), models_results)
 
 
 	def write_and_execute_xhail(self, inpt):
@@ -129,15 +520,101 @@ class RevisionModule:
 #		time_stamp = '_'.join([str(x) for x in [current_time[0], current_time[1], current_time[2], current_time[3], current_time[4], current_time[5]]])
 #		modified_workfile = '_'.join([self.work_file, time_stamp])
 		# try: remove the workfile
-		with open(self.work_file, 'w') as f:
-			for string in inpt:
-				read_data = f.write(string)
+		with open(self.work_file, 'wb') as f:
+			exporter.write_program(f, [inpt]) # inpt: any iterable of strings (streamed)
 		# could suppress there warnig messages later on
-		output_enc = subprocess.check_output(["java", "-jar", self.xhail, "-g", self.gringo, "-c", self.clasp, "-a", "-f", self.work_file])
+		command = ["java", "-jar", self.xhail, "-g", self.gringo, "-c", self.clasp, "-a", "-f", self.work_file]
+		process = self.start_solver(command, stdout=subprocess.PIPE)
+		try:
+			output_enc = process.communicate()[0]
+		finally:
+			self.solvers.remove(process)
+		if process.returncode != 0:
+			raise subprocess.CalledProcessError(process.returncode, command)
 		output_dec = output_enc.decode('utf-8')
 		return output_dec
 
 
+	def start_solver(self, command, **options): # own process group: helpers it starts (gringo, clasp) stopped with it
+		process = subprocess.Popen(command, start_new_session=True, **options)
+		self.solvers.append(process)
+		return process
+
+
+	def stream_xhail(self, inpt): # output lines as XHAIL produces them; XHAIL killed if the rest isn't read or time is up
+		with open(self.work_file, 'wb') as f:
+			exporter.write_program(f, [inpt])
+		command = ["java", "-jar", self.xhail, "-g", self.gringo, "-c", self.clasp, "-a", "-f", self.work_file]
+		process = self.start_solver(command, stdout=subprocess.PIPE)
+		timer = None
+		lock = Lock()
+		flags = {'done':False, 'stopped':False} # done: output no longer read; stopped: killed by the timer
+		if self.time_budget != None:
+			timer = Timer(self.time_budget, self.stop_solver, [process, lock, flags])
+			timer.start()
+		finished = False
+		try:
+			for line in process.stdout:
+				yield line.decode('utf-8')
+			finished = True
+		finally:
+			with lock: # the timer can't stop the solver from here on
+				flags['done'] = True
+			if timer != None:
+				timer.cancel()
+			if not finished:
+				self.kill_solver(process)
+			process.stdout.close()
+			process.wait()
+			self.solvers.remove(process)
+		if flags['stopped'] and (process.returncode < 0): # killed while still running (not just before it exited)
+			self.truncation = ('time', True)
+		if (process.returncode != 0) and (self.truncation == None):
+			raise subprocess.CalledProcessError(process.returncode, command)
+
+
+	def stop_solver(self, process, lock, flags): # time is up: answers reported so far are kept (XHAIL reports optimal ones only)
+		with lock:
+			if not flags['done']: # output read to the end: the run finished in time
+				flags['stopped'] = True
+				self.kill_solver(process)
+
+
+	def kill_solver(self, process):
+		try:
+			os.killpg(process.pid, signal.SIGKILL)
+		except ProcessLookupError: # already finished
+			pass
+
+
+	def collect_solutions(self, lines): # solutions from XHAIL output lines; XHAIL stopped once max_solutions arrived
+		solutions = []
+		try:
+			for solution in self.iter_output_revision(lines):
+				solutions.append(solution)
+				if len(solutions) == self.max_solutions:
+					self.truncation = ('solutions', True)
+					break
+		finally:
+			lines.close()
+		return solutions
+
+
+	def write_and_execute_gringo_clasp(self, inpt): # deductive programs (no abduction)
+		with open(self.work_file, 'wb') as f:
+			exporter.write_program(f, [inpt])
+		gringo = self.start_solver([self.gringo, self.work_file], stdout=subprocess.PIPE)
+		clasp = self.start_solver([self.clasp], stdin=gringo.stdout, stdout=subprocess.PIPE)
+		gringo.stdout.close()
+		try:
+			output_enc = clasp.communicate()[0]
+			gringo.wait()
+		finally:
+			self.solvers.remove(gringo)
+			self.solvers.remove(clasp)
+		return output_enc.decode('utf-8')
+
+
 	def process_output_consistency(self, output):
 		if "Answers     : 1" in output:
 			return True
@@ -146,38 +623,34 @@ class RevisionModule:
 
 
 	def make_derivative_models(self, base_model, extracted_results):
-		unique_interventions = set([result.exp_description.interventions for result in extracted_results])
+		# group results acc to interventions
+		if self.derivation_index != None:
+			grouped_results = self.derivation_index.group_results(extracted_results)
+		else:
+			grouped_results = {}
+			for result in extracted_results:
+				grouped_results.setdefault(result.exp_description.interventions, []).append(result)
 
-		# removes empty set; to avoid making pointless derivative model
-		try:
-			unique_interventions.remove(frozenset([]))
-		except:
-			pass
 		# create derived models and keep interventions info
 		models = {}
 		models[frozenset([])] = base_model # adding the base model
 		counter = 0
-		for interv_set in unique_interventions:
-			derived_model = copy(base_model)
-			derived_model.apply_interventions(interv_set)
-			derived_model.ID = 'deriv_%s_%s' % (base_model.ID, counter)
+		# empty set skipped; to avoid making pointless derivative model
+		for interv_set in exporter.ordered([interv for interv in grouped_results if (interv != frozenset([]))]): # canonical mode: stable IDs of derived models
+			if self.derivation_index != None:
+				derived_model = self.derivation_index.derived_model(base_model, interv_set, 'deriv_%s_%s' % (base_model.ID, counter))
+			else:
+				derived_model = copy(base_model)
+				derived_model.apply_interventions(interv_set)
+				derived_model.ID = 'deriv_%s_%s' % (base_model.ID, counter)
 			models[interv_set] = derived_model
 			counter += 1
 
-		# group results acc to interventions
-		grouped_results = {}
-		for interv_set in models.keys():
-			results_group = []
-			for result in extracted_results:
-				if interv_set == result.exp_description.interventions:
-					results_group.append(result)
-				else:
-					pass
-			grouped_results[interv_set] = results_group
 		# model:results association (based on interventions)
 		models_results = {} # model:relevant_results
-		for interv_set in models.keys():
-			models_results[models[interv_set]] = grouped_results[interv_set]
+		for interv_set in exporter.ordered(list(models.keys())):
+			# models are compared by structure: interventions that change nothing (or the same way) share the model
+			models_results.setdefault(models[interv_set], []).extend(grouped_results.get(interv_set, []))
 
 		return models_results
 
@@ -204,51 +677,25 @@ class RevisionModule:
 
 
 	def process_output_revision(self, raw_output):
-		pat_answer = re.compile('Answer.*?\n\n\x1b', re.DOTALL)
-		answers = pat_answer.findall(raw_output)
-
-		pat_add = re.compile('add\(.*?\)')
-		pat_remove = re.compile('remove\(.*?\)')
-		pat_not_incon = re.compile('not inconsistent\(.*?\)')
-		pat_ignored = re.compile('ignored\(.*?\)')
-		output = []
-		counter = 0
-		for ans in answers:
-#			print('RAW ANSWER')
-#			print(ans)
-			added = set(pat_add.findall(ans))
-			added = [ad.split('add(')[1] for ad in added] # using split not strip; strip matchech chars not string: overzelous
-			added = [ad.strip(')') for ad in added] # formatting: leaving only id
-
-#			print('added:')
-#			print(added)
-
-			removed = set(pat_remove.findall(ans))
-			removed = [rem.split('remove(')[1] for rem in removed]# using split not strip; strip matchech chars not string: overzelous
-			removed = [rem.strip(')') for rem in removed]
-
-#			print('removed:')
-#			print(removed)
-
-			covered = set(pat_not_incon.findall(ans))
-			covered = [cov.split('not inconsistent(')[1] for cov in covered]# using split not strip; strip matchech chars not string: overzelous
-			covered = [cov.strip(')') for cov in covered]
-			covered = [cov.split(',')[1] for cov in covered] # removing first argument
-
-#			print('covered:')
-#			print(covered)
-
-			ignored = set(pat_ignored.findall(ans))
-			ignored = [ign.split('ignored(')[1] for ign in ignored] # using split not strip; strip matchech chars not string: overzelous
-			ignored = [ign.strip(')') for ign in ignored]
-
-#			print('ignored:')
-#			print(ignored)
-
-			counter += 1
-			output.append((added, removed, covered, ignored))
-
-		return output
+		return list(self.iter_output_revision(raw_output.split('\n')))
+
+
+	def iter_output_revision(self, lines): # -> (added, removed, covered, ignored) per answer, as lines arrive
+		pat_atom = re.compile(r'(not inconsistent|add|remove|ignored)\((.*?)\)')
+		for answer in iter_answers(lines):
+			atoms = {'add':[], 'remove':[], 'not inconsistent':[], 'ignored':[]}
+			for line in answer:
+				for (kind, args) in pat_atom.findall(line):
+					if kind == 'not inconsistent':
+						args = args.split(',')[-1].strip() # removing first argument (if any: compact results)
+					if not (args in atoms[kind]):
+						atoms[kind].append(args)
+			covered = atoms['not inconsistent']
+			ignored = atoms['ignored']
+			if self.compact_results: # integer IDs of results
+				covered = [exporter.result_id(cov) for cov in covered]
+				ignored = [exporter.result_id(ign) for ign in ignored]
+			yield (atoms['add'], atoms['remove'], covered, ignored)
 
 
 	def get_current_best_model(self): # one of them at least
@@ -256,57 +703,396 @@ class RevisionModule:
 		model = random.choice([m for m in self.archive.working_models if (m.quality == max_quality)])
 		return copy(model)
 
-	def create_random_model(self):
-		numberActToChoose = random.choice(list(range(len(self.archive.mnm_activities)))) # presence of two versions of the same entity will trigger revision anyway
-		activities = random.sample(self.archive.mnm_activities, numberActToChoose)
+	def create_random_model(self, attempts=10):
+		for attempt in range(attempts): # known structures are drawn again (when refuted ones are excluded)
+			numberActToChoose = random.choice(list(range(len(self.archive.mnm_activities)))) # presence of two versions of the same entity will trigger revision anyway
+			activities = frozenset(random.sample(self.archive.mnm_activities, numberActToChoose))
+			if not (self.exclude_refuted and (activities in self.archive.model_registry)):
+				break
 		new_model = copy(list(self.archive.working_models)[0]) # will cause problems if there will be no working models left...
-		new_model.intermediate_activities = frozenset(activities)
+		new_model.intermediate_activities = activities
 		new_model.ID = 'random_base'
 		return new_model
 
 
+	def create_screened_random_model(self):
+		# random models screened in-process (termination conditions, clean model, results); fewest violations first
+		if self.random_candidates <= 1:
+			return self.create_random_model()
+		index = self.elements_index()
+		results = self.extract_results()
+		best = None
+		for attempt in range(self.random_candidates):
+			model = self.create_random_model()
+			(structural, inconsistent) = model_simulator.violations(model, self.make_derivative_models(model, results), index)
+			score = (structural, len(inconsistent))
+			if (best == None) or (score < best[0]):
+				best = (score, model)
+			if score == (0, 0): # consistent: nothing better
+				break
+		return best[1]
+
+
 	def prepare_input_execute_and_process(self, base_model, ignoring, force_new_model): # pretty much revise; base_model = original one
+		processed_output = self.prepare_input_and_execute(base_model, ignoring, force_new_model)
+		return self.process_revision_solutions(base_model, processed_output, self.truncation)
+
+
+	def prepare_input_and_execute(self, base_model, ignoring, force_new_model): # returns raw solutions (IDs only)
+		self.truncation = None
+		if self.revision_cache != None:
+			key = self.revision_key(base_model, ignoring, force_new_model)
+			if key in self.revision_cache:
+				return self.revision_cache[key]
+		if self.decompose and not (force_new_model or self.exclude_refuted): # whole structures compared to other models
+			solutions = self.execute_revision_decomposed(base_model, ignoring)
+		elif self.warm_start:
+			solutions = self.execute_revision_warm_started(base_model, ignoring, force_new_model)
+		else:
+			solutions = self.execute_revision(base_model, ignoring, force_new_model)
+		self.remember_revision(base_model, ignoring, force_new_model, solutions)
+		return solutions
+
+
+	def remember_revision(self, base_model, ignoring, force_new_model, solutions):
+		# records early stop of the solver (self.truncation); solutions cut by time are not cached: more time, more solutions;
+		# neither are solutions not proven optimal
+		if self.truncation != None:
+			self.archive.record(RevisionTruncated(base_model, self.truncation[0], len(solutions), self.truncation[1]))
+		if (self.revision_cache != None) and not ((self.truncation != None) and ((self.truncation[0] == 'time') or not self.truncation[1])):
+			self.revision_cache[self.revision_key(base_model, ignoring, force_new_model)] = solutions
+
+
+	def prepare_input_and_execute_batch(self, base_models, ignoring): # -> (raw solutions, truncation) per model; cached ones reused
+		solutions = [None for model in base_models]
+		truncations = [None for model in base_models]
+		if self.revision_cache != None:
+			solutions = [self.revision_cache.get(self.revision_key(model, ignoring, False)) for model in base_models]
+		pending = [number for number in range(len(base_models)) if (solutions[number] == None)]
+		for start in range(0, len(pending), self.batch_revision):
+			numbers = pending[start:start + self.batch_revision]
+			self.truncation = None # one solver call for all of them
+			for (number, out) in zip(numbers, self.execute_revision_batch([base_models[n] for n in numbers], ignoring)):
+				solutions[number] = out
+				truncations[number] = self.truncation
+				self.remember_revision(base_models[number], ignoring, False, out)
+		return (solutions, truncations)
+
+
+	def revision_key(self, base_model, ignoring, force_new_model):
+		# everything the revision program depends on (elements don't change during development)
+		results = self.extract_results()
+		if len(results) != self._revision_cache_results: # new evidence: cached solutions are stale
+			self.revision_cache.clear()
+			self._revision_cache_results = len(results)
+		key = [sorted([exporter.stable_key(x) for x in base_model.intermediate_activities]),
+			sorted([exporter.stable_key(x) for x in base_model.setup_conditions]),
+			sorted([exporter.stable_key(x) for x in base_model.termination_conditions]),
+			[res.ID for res in results], ignoring, force_new_model]
+		if force_new_model: # solutions must differ from all working models
+			key.append(sorted([sorted([exporter.stable_key(x) for x in mod.intermediate_activities]) for mod in self.archive.working_models]))
+		if self.exclude_refuted: # ... and from refuted ones
+			key.append(sorted([sorted([exporter.stable_key(x) for x in mod.intermediate_activities]) for mod in self.excluded_models(base_model)]))
+		return exporter.program_fingerprint([repr(key)])
+
+
+	def revision_candidates(self, base_model, ignoring, force_new_model=False): # -> (activities to add, activities to remove, results to ignore)
+		add_act = set([x for x in self.archive.mnm_activities if (x.add_cost != None)]) - set(base_model.intermediate_activities)
+		rem_act = set([x for x in base_model.intermediate_activities if (x.remove_cost != None)])
+		ign_res = []
+		if ignoring:
+			ign_res = self.extract_results()
+		if self.prune_candidates and not (force_new_model or self.exclude_refuted): # a new model may have to differ anywhere
+			related = self.related_to_violations(base_model)
+			add_act = set([act for act in add_act if ('activity', act.ID) in related])
+			rem_act = set([act for act in rem_act if ('activity', act.ID) in related])
+			ign_res = [res for res in ign_res if model_simulator.result_elements(res) & related]
+		return (add_act, rem_act, ign_res)
+
+
+	def related_to_violations(self, base_model):
+		# elements connected to unmet termination conditions, unclean parts of the model and inconsistent results;
+		# changes elsewhere only add cost and can't affect results about elements in here
+		activities = self.archive.mnm_activities + self.archive.import_activities + list(base_model.intermediate_activities) # not a set: equal activities may differ in ID
+		return model_simulator.related_elements(activities, self.elements_index(), self.violation_seeds(base_model))
+
+
+	def violation_seeds(self, base_model): # elements of unmet termination conditions, unclean parts of the model and inconsistent results
+		index = self.elements_index()
 		cmodel = copy(base_model)
-		cmodel.ID = 'base'
+		cmodel.ignored_results = frozenset([])
+		results = self.extract_results()
+		(structural, inconsistent) = model_simulator.violations(cmodel, self.make_derivative_models(cmodel, results), index)
+		simulation = model_simulator.ModelSimulation(cmodel, index)
+		seeds = set([('entity', cond.entity.ID) for cond in base_model.termination_conditions if not simulation.is_synthesizable(cond)])
+		seeds.update([('activity', a_id) for a_id in simulation.eliminated])
+		seeds.update([('entity', ent) for (ent, versions) in simulation.involved.items() if len(versions) > 1])
+		for res in inconsistent:
+			seeds.update(model_simulator.result_elements(res))
+		return seeds
+
+
+	def execute_revision_decomposed(self, base_model, ignoring):
+		# parts of the network not connected to each other (results link what they are about) revised in separate
+		# calls: changes in one part can't change predictions in another and costs add up, so combinations of
+		# optimal answers of the parts are the optimal answers for the whole model
+		index = self.elements_index()
+		results = self.extract_results()
+		activities = self.archive.mnm_activities + self.archive.import_activities + list(base_model.intermediate_activities)
+		elements = dict([(res.ID, model_simulator.result_elements(res)) for res in results])
+		if [res for res in results if not elements[res.ID]]: # not known which part a result is about
+			return self.execute_revision(base_model, ignoring, False)
+		component = model_simulator.components(activities, index, elements.values())
+		part = lambda node: component.get(node, node)
+		part_of_result = dict([(res.ID, part(min(elements[res.ID]))) for res in results])
+		touched = sorted(set([part(node) for node in self.violation_seeds(base_model)]))
+		if len(touched) < 2:
+			return self.execute_revision(base_model, ignoring, False)
+
+		(add_act, rem_act, ign_res) = self.revision_candidates(base_model, ignoring)
+		tasks = []
+		for (number, root) in enumerate(touched):
+			sub_model = mnm_repr.Model(base_model.ID,
+				[cond for cond in base_model.setup_conditions if part(('entity', cond.entity.ID)) == root],
+				[act for act in base_model.intermediate_activities if part(('activity', act.ID)) == root],
+				[cond for cond in base_model.termination_conditions if part(('entity', cond.entity.ID)) == root])
+			candidates = (set([act for act in add_act if part(('activity', act.ID)) == root]),
+				set([act for act in rem_act if part(('activity', act.ID)) == root]),
+				[res for res in ign_res if part_of_result[res.ID] == root])
+			tasks.append((number, sub_model, ignoring, candidates, [res for res in results if part_of_result[res.ID] == root]))
+
+		if self.processes > 1:
+			with Pool(processes=min(self.processes, len(tasks)), initializer=init_worker, initargs=(self, [])) as pool:
+				outputs = pool.map(revise_part_task, tasks)
+			truncations = [out[1] for out in outputs if out[1] != None]
+			truncations.sort(key=lambda truncation: truncation[0] != 'time') # a part out of time may have no answers
+			if truncations != []:
+				self.truncation = truncations[0]
+			outputs = [out[0] for out in outputs]
+		else:
+			outputs = [self.execute_revision(sub_model, ign, False, candidates, sub_results) for (number, sub_model, ign, candidates, sub_results) in tasks]
+		if [] in outputs: # one part can't be fixed: neither can the model
+			return []
+
+		untouched = [res.ID for res in results if not (part_of_result[res.ID] in touched)] # consistent as they are
+		solutions = []
+		for combination in product(*outputs):
+			if len(solutions) == self.max_solutions:
+				self.truncation = ('solutions', True)
+				break
+			solutions.append(tuple([list(chain(*[sol[i] for sol in combination])) for i in range(4)]))
+			solutions[-1][2].extend(untouched)
+		return solutions
+
 
-		res_mods = self.prepare_input_results_models_revision(cmodel)
+	def execute_revision(self, base_model, ignoring, force_new_model, candidates=None, results=None, bound=None):
+		# candidates: (activities to add, activities to remove, results to ignore); default: revision_candidates()
+		# results: known results the revised model has to explain (default: all)
+		# bound: (ignoring penalty, cost) no optimal answer exceeds
+		cmodel = copy(base_model)
+		cmodel.ID = 'base'
 
-		add_act = set([x for x in self.archive.mnm_activities if (x.add_cost != None)]) - set(cmodel.intermediate_activities)
-		rem_act = set([x for x in cmodel.intermediate_activities if (x.remove_cost != None)])
-		modeh_add_act = exporter.export_add_activities(add_act)
-		modeh_rem_act = exporter.export_remove_activities(rem_act)
+		members = None
+		penalties = None
+		if self.reduce_results:
+			if results == None:
+				results = self.extract_results()
+			(results, members, penalties) = self.reduced_results(results)
+		res_mods = self.prepare_input_results_models_revision(cmodel, results)
+
+		if candidates == None:
+			candidates = self.revision_candidates(cmodel, ignoring, force_new_model)
+		(add_act, rem_act, ign_res) = candidates
+		if members != None:
+			ign_res = [res for res in ign_res if res.ID in members]
+		modeh_add_act = exporter.iter_add_activities(add_act)
+		modeh_rem_act = exporter.iter_remove_activities(rem_act)
 
 		modeh_ignore = []
 		if ignoring:
-			results = [exp.results for exp in self.archive.known_results]
-			results = [val for sublist in results for val in sublist] # flatten
-			modeh_ignore = exporter.export_ignore_results(results)# added ignoring!!!
+			modeh_ignore = exporter.iter_ignore_results(ign_res, self.compact_results, penalties)# added ignoring!!!
+
+		bound_rules = []
+		if bound != None:
+			bound_rules = exporter.iter_revision_bound(add_act, rem_act, ign_res if ignoring else [], bound, self.compact_results, penalties)
 
 		inter_rules = exporter.interventions_rules()
 
 		difference_facts = []
 		model_difference_rules = []
+		external_models = self.excluded_models(base_model)
 		if force_new_model:
-			difference_facts = exporter.export_force_new_model(cmodel, self.archive.working_models)# base model (id) must not be in the working mods
+			external_models = list(self.archive.working_models) + external_models # base model (id) must not be in the working mods
+		if external_models != []:
+			difference_facts = exporter.iter_force_new_model(cmodel, external_models)
 			model_difference_rules = exporter.model_difference_rules()
 
 		max_number_activities = len(self.archive.mnm_activities + self.archive.import_activities)
 		mod_rules = exporter.models_rules(max_number_activities)
 		pred_rules = exporter.predictions_rules()
-		incons_rules = exporter.inconsistency_rules()
+		incons_rules = exporter.inconsistency_rules(self.compact_results)
 
-		inpt = [res_mods, modeh_add_act, modeh_rem_act, modeh_ignore, inter_rules, difference_facts, model_difference_rules, mod_rules, pred_rules, incons_rules]
-		inpt = [val for sublist in inpt for val in sublist] # flatten
+		inpt = chain(res_mods, modeh_add_act, modeh_rem_act, modeh_ignore, bound_rules, inter_rules, difference_facts, model_difference_rules, mod_rules, pred_rules, incons_rules) # streamed
 
-		raw_output = self.write_and_execute_xhail(inpt)
+		solutions = self.collect_solutions(self.stream_xhail(inpt))
+		if members != None:
+			solutions = self.expand_solutions(solutions, members)
+		return solutions
 
-#		# TEEEEESSSSSTTT
-#		print(raw_output)
 
-		processed_output = self.process_output_revision(raw_output)
+	def execute_revision_warm_started(self, base_model, ignoring, force_new_model):
+		# an earlier optimum of the lineage that still explains the results bounds (ignoring penalty, cost): the solver
+		# prunes worse answers early. Optimal answers are kept; if the bound is wrong after all, the search is repeated
+		candidates = self.revision_candidates(base_model, ignoring, force_new_model)
+		bound = self.warm_start_bound(base_model, force_new_model, candidates)
+		solutions = self.execute_revision(base_model, ignoring, force_new_model, candidates, None, bound)
+		if (bound != None) and (solutions == []) and (self.truncation == None):
+			solutions = self.execute_revision(base_model, ignoring, force_new_model, candidates)
+		self.remember_warm_start(base_model, solutions)
+		return solutions
+
+
+	def warm_start_bound(self, base_model, force_new_model, candidates): # -> (ignoring penalty, cost) or None
+		(add_act, rem_act, ign_res) = candidates
+		add_act = dict([(act, act) for act in add_act]) # activities as remembered -> candidates
+		excluded = set([mod.intermediate_activities for mod in self.excluded_models(base_model)])
+		if force_new_model:
+			excluded.update([mod.intermediate_activities for mod in self.archive.working_models])
+		results = self.extract_results()
+		bounds = []
+		for activities in self.warm_starts.get(warm_start_key(base_model), []):
+			added = activities - base_model.intermediate_activities
+			removed = base_model.intermediate_activities - activities
+			if (activities in excluded) or [act for act in added if not (act in add_act)] or [act for act in removed if not (act in rem_act)]:
+				continue # not an answer of this program
+			(violations, penalty, cost, ignored, model) = self.score_revision(base_model, (set([add_act[act] for act in added]), removed), results, set(ign_res))
+			if violations == 0:
+				bounds.append((penalty, cost))
+		if bounds == []:
+			return None
+		return min(bounds)
+
+
+	def remember_warm_start(self, base_model, solutions): # optima passed on to the base model and to the models revised from it
+		if solutions == []:
+			return
+		found = []
+		for solution in solutions:
+			model = copy(base_model)
+			model.apply_interventions([mnm_repr.Remove(self.archive.get_matching_element(e_id)) for e_id in solution[1]])
+			model.apply_interventions([mnm_repr.Add(self.archive.get_matching_element(e_id)) for e_id in solution[0]])
+			if not (model.intermediate_activities in found):
+				found.append(model.intermediate_activities)
+		lineage = self.warm_starts.get(warm_start_key(base_model), [])
+		structures = (found + [activities for activities in lineage if not (activities in found)])[:WARM_START_SIZE]
+		if len(self.warm_starts) > 10000: # models of long-gone lineages pile up
+			self.warm_starts = {}
+		self.warm_starts[warm_start_key(base_model)] = structures
+		for activities in found:
+			self.warm_starts[(base_model.setup_conditions, activities, base_model.termination_conditions)] = structures
+
+
+	def score_revision(self, base_model, state, results, ignorable): # -> (violations left, ignoring penalty, cost, ignored results, model)
+		model = copy(base_model)
+		model.apply_interventions([mnm_repr.Remove(act) for act in state[1]])
+		model.apply_interventions([mnm_repr.Add(act) for act in state[0]])
+		(structural, inconsistent) = model_simulator.violations(model, self.make_derivative_models(model, results), self.elements_index())
+		ignored = [res for res in inconsistent if res in ignorable]
+		penalty = sum([res.exp_description.experiment_type.ignoring_penalty for res in ignored])
+		cost = sum([act.add_cost for act in state[0]]) + sum([act.remove_cost for act in state[1]])
+		return (structural + len(inconsistent) - len(ignored), penalty, cost, ignored, model)
+
+
+	def execute_revision_batch(self, base_models, ignoring): # -> raw solutions per base model
+		if len(base_models) == 1:
+			return [self.execute_revision(base_models[0], ignoring, False)]
+		cmodels = []
+		for (number, base_model) in enumerate(base_models):
+			cmodel = copy(base_model)
+			cmodel.ID = 'base_%s' % number
+			cmodels.append(cmodel)
+
+		results = self.extract_results()
+		members = None
+		penalties = None
+		if self.reduce_results:
+			(results, members, penalties) = self.reduced_results(results)
+		revisions = [(cmodel, self.make_derivative_models(cmodel, results), self.revision_candidates(cmodel, ignoring)) for cmodel in cmodels]
+		if members != None:
+			revisions = [(cmodel, models_results, (add_act, rem_act, [res for res in ign_res if res.ID in members])) for (cmodel, models_results, (add_act, rem_act, ign_res)) in revisions]
+		base_of = dict([(model.ID, number) for (number, revision) in enumerate(revisions) for model in revision[1]])
+
+		exped_elements = self.prepare_input_elements()
+		exped_results = exporter.iter_results(results) # plain results: ignored() is scoped by base model
+		exped_revisions = exporter.iter_revision_batch(revisions, ignoring, self.delta_models, penalties, self.derived_as_rules)
+		if self.derived_as_rules:
+			exped_revisions = chain(exped_revisions, exporter.derived_models_rules())
+		elif self.delta_models:
+			exped_revisions = chain(exped_revisions, exporter.consensus_delta_rules())
+
+		difference_facts = []
+		model_difference_rules = []
+		if self.exclude_refuted:
+			structures = [act for act in self.archive.refuted_structures()]
+			structures.sort(key=lambda activities: sorted([exporter.stable_key(x) for x in activities]))
+			external_models = [mnm_repr.Model('refuted_%s' % number, [], activities, []) for (number, activities) in enumerate(structures)]
+			if external_models != []:
+				difference_facts = exporter.iter_force_new_models_batch(cmodels, external_models)
+				model_difference_rules = exporter.model_difference_rules()
+
+		max_number_activities = len(self.archive.mnm_activities + self.archive.import_activities)
+		mod_rules = exporter.models_rules(max_number_activities)
+		pred_rules = exporter.predictions_rules()
+		batch_rules = exporter.revision_batch_rules()
+
+		inpt = chain(exped_elements, exped_results, exped_revisions, difference_facts, model_difference_rules, mod_rules, pred_rules, batch_rules) # streamed
+
+		output = self.process_output_revision_batch(self.stream_xhail(inpt), base_of, len(base_models))
+		if output == [[] for model in base_models]: # one model can't be revised: find out which, the others still can
+			return [self.execute_revision(base_model, ignoring, False) for base_model in base_models]
+		if members != None:
+			output = [self.expand_solutions(solutions, members) for solutions in output]
+		return output
+
+
+	def process_output_revision_batch(self, lines, base_of, number_models):
+		# answers of the joint program are combinations of optimal answers of each base model: split and deduplicated
+		pat_hypothesis = re.compile(r'(add|remove|ignored)\((\w+),\s*base_(\d+)\)')
+		pat_not_incon = re.compile(r'not inconsistent\((\w+),\s*(\w+)\)')
+		position = {'add':0, 'remove':1, 'ignored':3} # in (added, removed, covered, ignored)
+		output = [[] for number in range(number_models)]
+		seen = [set() for number in range(number_models)]
+		for answer in iter_answers(lines):
+			solutions = [(set(), set(), set(), set()) for number in range(number_models)]
+			for line in answer:
+				for (kind, element, number) in pat_hypothesis.findall(line):
+					solutions[int(number)][position[kind]].add(element)
+				for (model, result) in pat_not_incon.findall(line):
+					solutions[base_of[model]][2].add(result)
+			for number in range(number_models):
+				key = tuple([frozenset(part) for part in solutions[number]])
+				if not (key in seen[number]):
+					seen[number].add(key)
+					output[number].append(tuple([sorted(part) for part in solutions[number]]))
+		return output
+
+
+	def excluded_models(self, base_model): # refuted structures as models, other than the base model itself
+		if not self.exclude_refuted:
+			return []
+		structures = [act for act in self.archive.refuted_structures() if (act != base_model.intermediate_activities)]
+		structures.sort(key=lambda activities: sorted([exporter.stable_key(x) for x in activities]))
+		return [mnm_repr.Model('refuted_%s' % number, [], activities, []) for (number, activities) in enumerate(structures)]
+
+
+	def process_revision_solutions(self, base_model, processed_output, truncation=None):
+		cmodel = copy(base_model)
+		cmodel.ID = 'base'
 		# decide what to do based on output
-		if processed_output == []: # revision fail
-			return False
+		if processed_output == []:
+			if (truncation != None) and (truncation[0] == 'time'): # no answer found in time: no change (not a failure)
+				return ([], False)
+			return False # revision fail
 
 #		# TEEEEESSSSSTTT
 #		print('processed output:')
@@ -321,7 +1107,11 @@ class RevisionModule:
 #		print(solutions_for_model_revision)
 
 		# random choice used to limit # of new models to 1: more than that would blow up experiment design!
-		new_mod = [random.choice([self.create_revised_models(cmodel, solution) for solution in solutions_for_model_revision])]
+		candidates = [self.create_revised_models(cmodel, solution) for solution in solutions_for_model_revision]
+		new_mod = []
+		if candidates != []: # (all optimal solutions may only update ignored results)
+			new_mod = [self.choose_new_model(base_model, candidates)]
+			self.add_to_reservoir([mod for mod in candidates if not (mod is new_mod[0])])
 
 		if (solution_for_ignoring_update != []): # update of ignoring results (pick one randomly, they're all optimal)
 			self.update_base_model(base_model, random.choice(solution_for_ignoring_update))
@@ -330,6 +1120,91 @@ class RevisionModule:
 		return (new_mod, updated_base_model)
 
 
+	def choose_new_model(self, base_model, candidates): # one of optimal revisions; random unless diverse_models
+		if not self.diverse_models:
+			return random.choice(candidates)
+		pool = [mod for mod in self.archive.working_models if not (mod is base_model)] # base model is replaced
+		distances = self.pool_distances(candidates, pool)
+		farthest = max([dist for dist in distances if dist != None] + [-1])
+		return random.choice([mod for (mod, dist) in zip(candidates, distances) if (dist == None) or (dist == farthest)])
+
+
+	def activity_bits(self, activities): # activities as a bitset (int); bits assigned as activities are met
+		bits = 0
+		for act in activities:
+			if not (act in self._activity_bits):
+				self._activity_bits[act] = len(self._activity_bits)
+			bits |= 1 << self._activity_bits[act]
+		return bits
+
+
+	def pool_distances(self, models, pool): # -> per model: activities in which it differs from the closest model in pool (None: empty pool)
+		pool_bits = set([self.activity_bits(mod.intermediate_activities) for mod in pool])
+		distances = []
+		for model in models:
+			bits = self.activity_bits(model.intermediate_activities)
+			distances.append(min([hamming(bits, other) for other in pool_bits]) if pool_bits else None)
+		return distances
+
+
+	def far_enough(self, models): # models not closer than min_distance to any working model
+		if self.min_distance <= 0:
+			return models
+		distances = self.pool_distances(models, self.archive.working_models)
+		return [mod for (mod, dist) in zip(models, distances) if (dist == None) or (dist >= self.min_distance)]
+
+
+	def record_additional_models(self, models):
+		if models == []: # no answer found in time: nothing new, not a failure
+			return False
+		accepted = self.far_enough(models)
+		if (accepted == []) and (models != []): # near-duplicates only
+			self.archive.record(AdditModProdFail())
+			return False
+		self.archive.record(AdditionalModels(accepted))
+		return True
+
+
+	def produce_additional_model_from_reservoir(self):
+		model = self.draw_from_reservoir()
+		if model == None:
+			return False
+		self.archive.record(AdditionalModels([model]))
+		return True
+
+
+	def add_to_reservoir(self, models):
+		if self.reservoir_size == 0:
+			return
+		self.refresh_reservoir()
+		for model in models:
+			if [mod for mod in self.reservoir if mod.intermediate_activities == model.intermediate_activities]:
+				continue # duplicate
+			self.reservoir.append(model)
+		self.reservoir = self.reservoir[-self.reservoir_size:] # oldest dropped
+
+
+	def refresh_reservoir(self): # models in the reservoir were consistent with results known when they were added
+		number_results = len(self.extract_results())
+		if number_results != self._reservoir_results:
+			self.reservoir = []
+			self._reservoir_results = number_results
+
+
+	def draw_from_reservoir(self): # -> model not among working models, or None if there is none
+		if self.reservoir_size == 0:
+			return None
+		self.refresh_reservoir()
+		activities_from_current_models = [mod.intermediate_activities for mod in self.archive.working_models]
+		self.reservoir = [mod for mod in self.reservoir if not (mod.intermediate_activities in activities_from_current_models)]
+		self.reservoir = self.far_enough(self.reservoir)
+		if self.reservoir == []:
+			return None
+		model = random.choice(self.reservoir)
+		self.reservoir.remove(model)
+		return model
+
+
 	def update_base_model(self, base_model, solution):
 		covered_res = [self.archive.get_matching_result(res_id) for res_id in solution[2]]
 		ignored_res = [self.archive.get_matching_result(res_id) for res_id in solution[3]]
@@ -338,61 +1213,72 @@ class RevisionModule:
 
 
 class RevCAddB(RevisionModule): # rev: minimise changes; additional: revise the best
-	def __init__(self, archive, sfx=""):
-		RevisionModule.__init__(self, archive, sfx=sfx)
+	def __init__(self, archive, sfx="", **options):
+		RevisionModule.__init__(self, archive, sfx=sfx, **options)
 
 	def revise(self, base_model, force_new_model=False):
-		return self.prepare_input_execute_and_process(base_model, False, force_new_model)
+		return self.prepare_input_execute_and_process(base_model, self.ignoring, force_new_model)
 
 	def produce_additional_models(self):
+		if self.produce_additional_model_from_reservoir():
+			return
 		model = self.get_current_best_model()
 		out = self.revise(model, True)
 		if out == False:
 			self.archive.record(AdditModProdFail())
 		else:
-			self.archive.record(AdditionalModels(out[0]))
+			self.record_additional_models(out[0])
 
 		if out[1] == True:
 			raise ValueError('produce_additional_models: revised set of ignored results instead of model itself')
 
 
 class RevCAddR(RevisionModule): # rev: minimise changes; additional: random
-	def __init__(self, archive, sfx=""):
-		RevisionModule.__init__(self, archive, sfx=sfx)
+	def __init__(self, archive, sfx="", **options):
+		RevisionModule.__init__(self, archive, sfx=sfx, **options)
 
 	def revise(self, base_model, force_new_model=False):
-		return self.prepare_input_execute_and_process(base_model, False, force_new_model)
+		return self.prepare_input_execute_and_process(base_model, self.ignoring, force_new_model)
 
 	def produce_additional_models(self):
-		model = self.create_random_model()
+		if self.produce_additional_model_from_reservoir():
+			return
+		model = self.create_screened_random_model()
 		if not self.check_consistency(model):
 			out = self.revise(model)
 			if out == False:
 				self.archive.record(AdditModProdFail())
+				return
 			else:
-				self.archive.record(AdditionalModels(out[0]))
+				self.record_additional_models(out[0])
+				return
 		else:
-			self.archive.record(AdditionalModels([model]))
+			self.record_additional_models([model])
+			return
 
 		if out[1] == True:
 			raise ValueError('produce_additional_models: revised set of ignored results instead of model itself')
 
 
 class RevCIAddB(RevisionModule): # rev: minimise changes and ignored; additional: revise the best
-	def __init__(self, archive, sfx=""):
-		RevisionModule.__init__(self, archive, sfx=sfx)
+	ignoring = True
+
+	def __init__(self, archive, sfx="", **options):
+		RevisionModule.__init__(self, archive, sfx=sfx, **options)
 
 	def revise(self, base_model, force_new_model=False):
-		return self.prepare_input_execute_and_process(base_model, True, force_new_model)
+		return self.prepare_input_execute_and_process(base_model, self.ignoring, force_new_model)
 
 	def produce_additional_models(self):
+		if self.produce_additional_model_from_reservoir():
+			return
 		model = self.get_current_best_model()
 		out = self.revise(model, True)
 		if out == False:
 			self.archive.record(AdditModProdFail())
 			return
 		else:
-			self.archive.record(AdditionalModels(out[0]))
+			self.record_additional_models(out[0])
 			return
 
 		if out[1] == True:
@@ -400,25 +1286,127 @@ class RevCIAddB(RevisionModule): # rev: minimise changes and ignored; additional
 
 
 class RevCIAddR(RevisionModule): # rev: minimise changes and ignored; additional: random
-	def __init__(self, archive, sfx=""):
-		RevisionModule.__init__(self, archive, sfx=sfx)
+	ignoring = True
+
+	def __init__(self, archive, sfx="", **options):
+		RevisionModule.__init__(self, archive, sfx=sfx, **options)
 
 	def revise(self, base_model, force_new_model=False):
-		return self.prepare_input_execute_and_process(base_model, True, force_new_model)
+		return self.prepare_input_execute_and_process(base_model, self.ignoring, force_new_model)
 
 	def produce_additional_models(self):
-		model = self.create_random_model()
+		if self.produce_additional_model_from_reservoir():
+			return
+		model = self.create_screened_random_model()
 		if not self.check_consistency(model):
 			out = self.revise(model, True)
 			if out == False:
 				self.archive.record(AdditModProdFail())
 				return
 			else:
-				self.archive.record(AdditionalModels(out[0]))
+				self.record_additional_models(out[0])
 				return
 		else:
-			self.archive.record(AdditionalModels([model]))
+			self.record_additional_models([model])
 			return
 
 		if out[1] == True:
 			raise ValueError('produce_additional_models: revised set of ignored results instead of model itself')
+
+
+class RevLSAddB(RevCAddB): # rev: local search scored in-process (minimise changes, optionally ignored); additional: revise the best
+	def __init__(self, archive, sfx="", ignoring=False, beam_width=5, max_changes=None, polish=False, **options):
+		RevCAddB.__init__(self, archive, sfx=sfx, **options)
+		self.ignoring = ignoring
+		self.beam_width = beam_width
+		self.max_changes = max_changes # None: up to the number of candidate changes
+		self.polish = polish # XHAIL run restricted to the changes and results used by found solutions
+
+
+	def execute_revision(self, base_model, ignoring, force_new_model, candidates=None, results=None, bound=None):
+		if candidates == None:
+			candidates = self.revision_candidates(base_model, ignoring, force_new_model)
+		solutions = self.local_search(base_model, ignoring, force_new_model, candidates, results)
+		if self.polish and (solutions != []):
+			add_act = set([act for act in candidates[0] if [sol for sol in solutions if act.ID in sol[0]]])
+			rem_act = set([act for act in candidates[1] if [sol for sol in solutions if act.ID in sol[1]]])
+			ign_res = [res for res in candidates[2] if [sol for sol in solutions if res.ID in sol[3]]]
+			polished = RevisionModule.execute_revision(self, base_model, ignoring, force_new_model, (add_act, rem_act, ign_res), results, bound)
+			if polished != []:
+				return polished
+		return solutions
+
+
+	def execute_revision_batch(self, base_models, ignoring): # searches don't share anything
+		return [self.execute_revision(base_model, ignoring, False) for base_model in base_models]
+
+
+	def local_search(self, base_model, ignoring, force_new_model, candidates, results=None):
+		# beam search over sets of additions and removals; inconsistent results are ignored when allowed.
+		# objective as in the revision program: ignoring penalty first, then cost of changes
+		deadline = None
+		if self.time_budget != None:
+			deadline = time() + self.time_budget
+		add_act = exporter.ordered(list(candidates[0]))
+		rem_act = exporter.ordered(list(candidates[1]))
+		ignorable = set(candidates[2])
+		if results == None:
+			results = self.extract_results()
+		activities_from_current_models = [mod.intermediate_activities for mod in self.archive.working_models]
+		excluded = set([mod.intermediate_activities for mod in self.excluded_models(base_model)])
+		max_changes = self.max_changes
+		if max_changes == None:
+			max_changes = len(add_act) + len(rem_act)
+
+		start = (frozenset([]), frozenset([])) # (added, removed)
+		scores = {start:self.score_revision(base_model, start, results, ignorable)}
+		beam = [start]
+		best = None # (penalty, cost)
+		best_states = []
+		depth = 0
+		exhaustive = True # no state dropped by the beam width or max_changes
+		while beam != []:
+			for state in beam:
+				(hard, penalty, cost, ignored, model) = scores[state]
+				if (hard != 0) or (model.intermediate_activities in excluded) or (force_new_model and (model.intermediate_activities in activities_from_current_models)):
+					continue
+				if (best == None) or ((penalty, cost) < best):
+					best = (penalty, cost)
+					best_states = [state]
+				elif ((penalty, cost) == best) and not (state in best_states):
+					best_states.append(state)
+			if (deadline != None) and (time() > deadline):
+				self.truncation = ('time', False) # best found so far, not proven optimal
+				break
+			if depth == max_changes:
+				exhaustive = exhaustive and (max_changes == len(add_act) + len(rem_act))
+				break
+			if (best != None) and (best[0] == 0): # changes only add cost: no better solution below these
+				beam = [state for state in beam if scores[state][2] < best[1]]
+			children = []
+			for state in beam:
+				children.extend([(state[0] | frozenset([act]), state[1]) for act in add_act if not (act in state[0])])
+				children.extend([(state[0], state[1] | frozenset([act])) for act in rem_act if not (act in state[1])])
+			evaluated = set()
+			for child in children:
+				if (deadline != None) and (time() > deadline):
+					self.truncation = ('time', False)
+					break
+				if not (child in scores):
+					scores[child] = self.score_revision(base_model, child, results, ignorable)
+				evaluated.add(child)
+			evaluated = list(evaluated)
+			evaluated.sort(key=lambda st: scores[st][:3] + (sorted([act.ID for act in st[0]]), sorted([act.ID for act in st[1]])))
+			exhaustive = exhaustive and (len(evaluated) <= self.beam_width)
+			beam = evaluated[:self.beam_width]
+			depth += 1
+		if (not exhaustive) and (self.truncation == None): # search finished, but over part of the states: best found, not proven optimal
+			self.truncation = ('heuristic', False)
+
+		solutions = []
+		for state in best_states:
+			ignored = scores[state][3]
+			covered = [res.ID for res in results if not (res in ignored)]
+			solutions.append(([act.ID for act in state[0]], [act.ID for act in state[1]], covered, [res.ID for res in ignored]))
+		return solutions
+
@@ -11,6 +11,9 @@ from tests import cost_model_test
 from tests import experiment_module_test
 from tests import oracle_test
 from tests import overseer_test
+from tests import export_session_test
+from tests import model_simulator_test
+from tests import derivation_index_test
 
 suite_1 = unittest.TestLoader().loadTestsFromTestCase(mnm_repr_test.ModelTest)
 suite_2 = unittest.TestLoader().loadTestsFromTestCase(archive_test.ArchiveTest)
@@ -21,6 +24,9 @@ suite_6 = unittest.TestLoader().loadTestsFromTestCase(cost_model_test.CostModelT
 suite_7 = unittest.TestLoader().loadTestsFromTestCase(experiment_module_test.ExperimentModuleTest)
 suite_8 = unittest.TestLoader().loadTestsFromTestCase(oracle_test.OracleTest)
 suite_9 = unittest.TestLoader().loadTestsFromTestCase(overseer_test.OverseerTest)
+suite_10 = unittest.TestLoader().loadTestsFromTestCase(export_session_test.ExportSessionTest)
+suite_11 = unittest.TestLoader().loadTestsFromTestCase(model_simulator_test.ModelSimulatorTest)
+suite_12 = unittest.TestLoader().loadTestsFromTestCase(derivation_index_test.DerivationIndexTest)
 
 suits = [suite_5] #suite_1, suite_2, suite_3, suite_4, suite_5, suite_6, suite_7, suite_8
 
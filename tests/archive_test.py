@@ -53,6 +53,18 @@ class ArchiveTest(unittest.TestCase):
 		self.archive.record(event)
 		self.assertIn(event, self.archive.development_history)
 
+	def test_subscribe(self):
+		class Listener:
+			def __init__(self):
+				self.events = []
+			def notify(self, event):
+				self.events.append(event)
+		listener = Listener()
+		self.archive.subscribe(listener)
+		event = archive.UpdatedModelQuality('mod', 1)
+		self.archive.record(event)
+		self.assertEqual(listener.events, [event])
+
 	def test_record_InitialModels(self):
 		mod1 = mnm_repr.Model(None, [1], [], [])
 		mod2 = mnm_repr.Model(None, [2], [], [])
@@ -62,6 +74,20 @@ class ArchiveTest(unittest.TestCase):
 		self.assertIn(mod1, self.archive.working_models)
 		self.assertIn(mod2, self.archive.working_models)
 
+	def test_model_registry(self):
+		act1 = mnm_repr.Reaction('act1', [], [])
+		mod1 = mnm_repr.Model(None, [], [act1], [])
+		mod2 = mnm_repr.Model(None, [], [], [])
+		mod3 = mnm_repr.Model(None, [1], [act1], [])
+		self.archive.record(archive.InitialModels([mod1, mod2]))
+		self.assertEqual(self.archive.model_fate(mod1), 'working')
+		self.archive.record(archive.RefutedModels([mod1]))
+		self.assertEqual(self.archive.model_fate(mod3), 'refuted') # the same activities
+		self.assertEqual(self.archive.refuted_structures(), [frozenset([act1])])
+		self.archive.record(archive.RedundantModel(mod2, mnm_repr.Model(None, [1], [], [])))
+		self.assertEqual(self.archive.model_fate(mod2), 'working') # redundant with a working model
+		self.assertEqual(self.archive.model_fate(mnm_repr.Model(None, [], [mnm_repr.Reaction('act2', [1], [2])], [])), None)
+
 	def test_record_InitialResults(self):
 		exp1 = exp_repr.Experiment('exp1')
 		exp2 = exp_repr.Experiment('exp2')
@@ -0,0 +1,59 @@
+#! /usr/bin/env python3
+# I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
+
+import unittest
+import mnm_repr
+import exp_repr
+from derivation_index import DerivationIndex
+from revision_module import RevisionModule
+from archive import Archive, NewResults, AcceptedResults
+
+
+class DerivationIndexTest(unittest.TestCase):
+	def setUp(self):
+		self.met1 = mnm_repr.Metabolite('met1')
+		self.cond = mnm_repr.PresentEntity(self.met1, mnm_repr.Medium())
+		self.archive = Archive()
+		self.archive.mnm_entities = [self.met1]
+		self.archive.mnm_compartments = [mnm_repr.Medium()]
+		self.index = DerivationIndex(self.archive)
+		self.model = mnm_repr.Model('m_0', [self.cond], [], [])
+
+
+	def accept(self, interventions, outcome):
+		des = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), interventions)
+		res = exp_repr.Result(None, des, outcome)
+		exp = exp_repr.Experiment(None, [res])
+		self.archive.record(NewResults(exp))
+		self.archive.record(AcceptedResults(exp))
+		return res
+
+
+	def test_groups_follow_archive(self):
+		res0 = self.accept([], 'true')
+		res1 = self.accept([mnm_repr.Remove(self.cond)], 'false')
+		res2 = self.accept([mnm_repr.Remove(self.cond)], 'false')
+		self.assertEqual(self.index.number_results, 3)
+		self.assertEqual(self.index.groups, {frozenset([]):[res0], frozenset([mnm_repr.Remove(self.cond)]):[res1, res2]})
+		self.assertEqual(self.index.group_results([res0, res2]), {frozenset([]):[res0], frozenset([mnm_repr.Remove(self.cond)]):[res2]})
+
+
+	def test_derived_model_cached(self):
+		interventions = frozenset([mnm_repr.Remove(self.cond)])
+		derived1 = self.index.derived_model(self.model, interventions, 'deriv_m_0_0')
+		derived2 = self.index.derived_model(mnm_repr.Model('base', [self.cond], [], []), interventions, 'deriv_base_0')
+		self.assertEqual(len(self.index.derived), 1)
+		self.assertEqual((derived1.ID, derived2.ID), ('deriv_m_0_0', 'deriv_base_0'))
+		self.assertEqual(derived1.setup_conditions, frozenset([]))
+		self.assertTrue(derived1.setup_conditions is derived2.setup_conditions)
+
+
+	def test_make_derivative_models(self):
+		res0 = self.accept([], 'true')
+		res1 = self.accept([mnm_repr.Remove(self.cond)], 'false')
+		rev = RevisionModule(self.archive)
+		indexed = RevisionModule(self.archive, derivation_index=True)
+		for results in [[res0, res1], [res1]]:
+			out = indexed.make_derivative_models(self.model, results)
+			self.assertEqual(out, rev.make_derivative_models(self.model, results))
+			self.assertEqual(sorted([mod.ID for mod in out]), ['deriv_m_0_0', 'm_0'])
@@ -0,0 +1,54 @@
+#! /usr/bin/env python3
+# I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
+
+import unittest
+import exporter
+import mnm_repr
+import exp_repr
+from export_session import ExportSession
+from archive import Archive, InitialModels, NewResults, AcceptedResults, RefutedModels, RevisedModel
+
+
+class ExportSessionTest(unittest.TestCase):
+	def setUp(self):
+		self.met1 = mnm_repr.Metabolite('met1')
+		self.comp1 = mnm_repr.Medium()
+		self.cond = mnm_repr.PresentEntity(self.met1, self.comp1)
+		self.act1 = mnm_repr.Reaction('act1', [], [self.cond])
+		self.archive = Archive()
+		self.archive.mnm_entities = [self.met1]
+		self.archive.mnm_compartments = [self.comp1]
+		self.archive.mnm_activities = [self.act1]
+		self.mod1 = mnm_repr.Model(None, [], [self.act1], [])
+		self.mod2 = mnm_repr.Model(None, [self.cond], [], [])
+		self.archive.record(InitialModels([self.mod1, self.mod2]))
+		self.session = ExportSession(self.archive)
+
+
+	def test_elements(self):
+		out = self.session.export_elements()
+		self.assertIn('\nmetabolite(met1,none).', out)
+		self.assertIn('\ncompartment(c_01).', out)
+		self.assertIn('\nreaction(act1).', out)
+
+
+	def test_new_result(self):
+		des = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), [])
+		exp = exp_repr.Experiment(None, [exp_repr.Result(None, des, 'true')])
+		self.archive.record(NewResults(exp))
+		self.assertEqual(self.session.export_results(), []) # not accepted yet
+		self.archive.record(AcceptedResults(exp))
+		self.assertEqual(self.session.export_results(), ['\nresult(res_0, experiment(detection_entity_exp, met1), true).'])
+		self.assertEqual(self.session.export_bans(), ['\n:- designed(experiment(detection_entity_exp, met1)).'])
+		self.assertEqual(len(self.session.results), 1)
+
+
+	def test_models_follow_archive(self):
+		self.assertEqual(sorted(self.session.export_models()), sorted(exporter.export_models_exp_design(self.archive.working_models)))
+		mod3 = mnm_repr.Model(None, [self.cond], [self.act1], [])
+		self.archive.record(RefutedModels([self.mod1]))
+		self.archive.record(RevisedModel(self.mod1, [mod3]))
+		out = self.session.export_models()
+		self.assertEqual(sorted(out), sorted(exporter.export_models_exp_design(self.archive.working_models)))
+		self.assertNotIn('\nadded_to_model(act1,m_0).', out)
+		self.assertIn('\nadded_to_model(act1,m_2).', out)
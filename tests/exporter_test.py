@@ -2,6 +2,7 @@
 # I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
 
 import unittest
+import io
 import exporter
 import mnm_repr
 import exp_repr
@@ -73,6 +74,42 @@ class ExporterTest(unittest.TestCase):
 		self.assertIn('\nadded_to_model(a1,m1).', exported)
 		self.assertIn('\nadded_to_model(a2,m1).', exported)
 
+	def test_export_models_consensus_delta(self):
+		# two out of three models share act_1 and the setup; one model differs
+		cond_subst_1 = mnm_repr.PresentEntity(mnm_repr.Metabolite('met1'), mnm_repr.Medium())
+		act_1 = mnm_repr.Activity('a1', None, ['1'], [])
+		act_2 = mnm_repr.Activity('a2', None, ['2'], [])
+		m1 = mnm_repr.Model('m1', [cond_subst_1], [act_1], [])
+		m2 = mnm_repr.Model('m2', [cond_subst_1], [act_1, act_2], [])
+		m3 = mnm_repr.Model('m3', [], [act_2], [])
+		exported = exporter.export_models_exp_design([m1, m2, m3], delta=True)
+		self.assertEqual('\nmodel(m1;m2;m3).', exported[0])
+		self.assertIn('\nconsensus(setup_present(met1,none,c_01)).', exported)
+		self.assertIn('\nconsensus(a1).', exported)
+		self.assertIn('\nconsensus(a2).', exported)
+		self.assertIn('\ndelta_removed(a2,m1).', exported)
+		self.assertIn('\ndelta_removed(a1,m3).', exported)
+		self.assertIn('\ndelta_removed(setup_present(met1,none,c_01),m3).', exported)
+		self.assertEqual(len(exported), 7)
+
+	def test_export_models_derived(self):
+		# derived models: the base model's specification and the changes of each derived model
+		cond_subst_1 = mnm_repr.PresentEntity(mnm_repr.Metabolite('met1'), mnm_repr.Medium())
+		act_1 = mnm_repr.Activity('a1', None, ['1'], [])
+		act_2 = mnm_repr.Activity('a2', None, ['2'], [])
+		base = mnm_repr.Model('base', [cond_subst_1], [act_1], [])
+		deriv_1 = mnm_repr.Model('deriv_base_0', [], [act_1], []) # setup removed
+		deriv_2 = mnm_repr.Model('deriv_base_1', [cond_subst_1], [act_1, act_2], []) # activity added
+		exported = exporter.export_models_derived([base, deriv_1, deriv_2], mnm_repr.Model('m_0', [cond_subst_1], [act_1], []))
+		self.assertEqual('\nmodel(base;deriv_base_0;deriv_base_1).', exported[0])
+		self.assertIn('\nadded_to_model(setup_present(met1,none,c_01),base).', exported)
+		self.assertIn('\nadded_to_model(a1,base).', exported)
+		self.assertIn('\nderived_from(deriv_base_0,base).', exported)
+		self.assertIn('\nderived_removed(setup_present(met1,none,c_01),deriv_base_0).', exported)
+		self.assertIn('\nderived_from(deriv_base_1,base).', exported)
+		self.assertIn('\nderived_added(a2,deriv_base_1).', exported)
+		self.assertEqual(len(exported), 7)
+
 	def test_export_termination_conds_consistency(self):
 		# one cond
 		cond_subst_1 = mnm_repr.PresentEntity(mnm_repr.Metabolite('met1'), mnm_repr.Medium())
@@ -99,6 +136,44 @@ class ExporterTest(unittest.TestCase):
 		self.assertIn('\nrelevant(res2, m1).', exported)
 		self.assertIn('\n:- inconsistent(m1, res2).', exported)
 
+	def test_export_consistency_batch(self):
+		# two base models: failures scoped per model, ignored results per model
+		cond = mnm_repr.PresentEntity(mnm_repr.Metabolite('met1'), mnm_repr.Medium())
+		res1 = exp_repr.Result('res1', None, None)
+		m1 = mnm_repr.Model('m1', [], [], [cond])
+		m2 = mnm_repr.Model('m2', [cond], [], [])
+		m2.ignored_results = frozenset([res1])
+		exported = exporter.export_consistency_batch([(m1, {m1:[res1]}), (m2, {m2:[res1]})])
+		self.assertIn('\nmodel(m1;m2).', exported)
+		self.assertIn('\nfailed(m1) :- not synthesizable(met1, none, c_01, m1).', exported)
+		self.assertIn('\nfailed(m2) :- not_clean_model(m2).', exported)
+		self.assertIn('\nrelevant(res1, m1).', exported)
+		self.assertNotIn('\nrelevant(res1, m2).', exported)
+		self.assertIn('\nfailed(m2) :- inconsistent(m2, Result).', exported)
+		self.assertNotIn('\n:- not_clean_model(m1).', exported)
+
+
+	def test_export_revision_batch(self):
+		# hypotheses scoped by base model; derived models follow their base
+		a1 = mnm_repr.Activity('act1', None, ['a'], [])
+		m1 = mnm_repr.Model('base_0', [], [], [])
+		m2 = mnm_repr.Model('base_1', [], [a1], [])
+		d1 = mnm_repr.Model('deriv_base_0_0', [mnm_repr.PresentEntity(mnm_repr.Metabolite('met1'), mnm_repr.Medium())], [], [])
+		res1 = exp_repr.Result('res1', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), []), None)
+		exported = exporter.export_revision_batch([(m1, {m1:[], d1:[res1]}, ([a1], [], [res1])), (m2, {m2:[res1]}, ([], [a1], [res1]))], True)
+		self.assertIn('\nmodel(base_0;deriv_base_0_0;base_1).', exported)
+		self.assertIn('\nbase_of(deriv_base_0_0, base_0).', exported)
+		self.assertIn('\nbase_of(base_1, base_1).', exported)
+		self.assertIn('\n#example not inconsistent(deriv_base_0_0, res1).', exported)
+		self.assertIn('\n#modeh add(act1, base_0) =1 @1.', exported)
+		self.assertIn('\n#modeh remove(act1, base_1) =1 @1.', exported)
+		self.assertIn('\n#modeh ignored(res1, base_1) =1 @2.', exported)
+		self.assertNotIn('\n#modeh ignored(res1, base_1) =1 @2.', exporter.export_revision_batch([(m2, {m2:[res1]}, ([], [a1], [res1]))], False))
+		external = mnm_repr.Model('refuted_0', [], [a1], [])
+		exported = exporter.export_force_new_models_batch([m1, m2], [external])
+		self.assertIn('\n#example different(base_0, refuted_0).', exported)
+		self.assertNotIn('\n#example different(base_1, refuted_0).', exported) # the same activities
+
 
 	def test_export_add_activities(self):
 		a1 = mnm_repr.Activity('act1', None, ['a'], [])
@@ -123,6 +198,19 @@ class ExporterTest(unittest.TestCase):
 		out = exporter.export_ignore_results([res1, res2])
 		self.assertIn('\n#modeh ignored(res1) =1 @2.', out)
 		self.assertIn('\n#modeh ignored(res2) =1 @2.', out)
+		out = exporter.export_ignore_results([res1], penalties={'res1':3}) # res1 stands for three results
+		self.assertEqual(out, ['\n#modeh ignored(res1) =3 @2.'])
+
+
+	def test_export_revision_bound(self):
+		act1 = mnm_repr.Reaction('act1', [], [])
+		act1.add_cost = 2
+		act2 = mnm_repr.Reaction('act2', [], [])
+		act2.remove_cost = 1
+		res1 = exp_repr.Result('res_1', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('e1')), None)
+		out = exporter.export_revision_bound([act1], [act2], [res1], (1, 3))
+		self.assertEqual(out, ['\n:- 2 #sum[ignored(res_1)=1].', '\n:- 4 #sum[add(act1)=2, remove(act2)=1], 1 #sum[ignored(res_1)=1].'])
+		self.assertEqual(exporter.export_revision_bound([act1], [], [], (0, 3)), ['\n:- 4 #sum[add(act1)=2].'])
 
 
 	def test_export_force_new_model(self):
@@ -261,3 +349,73 @@ class ExporterTest(unittest.TestCase):
 		self.assertIn(',remove(setup_present(m2, none, c_01))', out)
 		self.assertIn(',add(setup_present(m1, none, c_01))', out)
 
+
+
+	def test_canonical_ordering(self):
+		act_1 = mnm_repr.Activity('a1', None, ['1'], [])
+		act_2 = mnm_repr.Activity('a2', None, ['2'], [])
+		act_3 = mnm_repr.Activity('a3', None, ['3'], [])
+		m = mnm_repr.Model('m1', [], [act_3, act_1, act_2], [])
+		exporter.set_canonical_ordering(True)
+		try:
+			exported = exporter.export_model_specification(m)
+			exported_rem = exporter.export_remove_activities(set([act_2, act_3, act_1]))
+		finally:
+			exporter.set_canonical_ordering(False)
+		self.assertEqual(['\nadded_to_model(a1,m1).', '\nadded_to_model(a2,m1).', '\nadded_to_model(a3,m1).'], exported)
+		self.assertEqual(['\n#modeh remove(a1) =1 @1.', '\n#modeh remove(a2) =1 @1.', '\n#modeh remove(a3) =1 @1.'], exported_rem)
+
+
+	def test_program_fingerprint(self):
+		out_1 = exporter.program_fingerprint(['\nmodel(m1).', '\nadded_to_model(a1,m1).'])
+		out_2 = exporter.program_fingerprint(['\nmodel(m1).\nadded_to_model(a1,m1).'])
+		out_3 = exporter.program_fingerprint(['\nmodel(m1).', '\nadded_to_model(a2,m1).'])
+		self.assertEqual(out_1, out_2)
+		self.assertNotEqual(out_1, out_3)
+
+
+	def test_iter_results(self):
+		exp_type = exp_repr.DetectionEntity('e1')
+		res = exp_repr.Result('res1', exp_repr.ExperimentDescription(exp_type, []), 'true')
+		out = exporter.iter_results([res])
+		self.assertNotIsInstance(out, list)
+		self.assertEqual(list(out), exporter.export_results([res]))
+
+
+	def test_write_program(self):
+		sink = io.BytesIO()
+		facts = ('\nfact(%s).' % i for i in range(100))
+		written = exporter.write_program(sink, [['\nmodel(m1).'], facts], buffer_size=64)
+		expected = '\nmodel(m1).' + ''.join(['\nfact(%s).' % i for i in range(100)])
+		self.assertEqual(sink.getvalue(), expected.encode('utf-8'))
+		self.assertEqual(written, len(expected))
+
+
+	def test_export_results_compact(self):
+		exp_type = exp_repr.LocalisationEntity('p1', 'c_02')
+		res = exp_repr.Result('res_7', exp_repr.ExperimentDescription(exp_type, []), 'true')
+		exported = exporter.export_results_compact([res])
+		self.assertEqual(['\nres_localisation_entity(7,p1,c_02,true).'], exported)
+		self.assertEqual(exporter.result_id(exporter.result_number(res)), 'res_7')
+		self.assertRaises(ValueError, exporter.result_number, exp_repr.Result('r1', None, None))
+
+
+	def test_export_relevancy_compact(self):
+		res1 = exp_repr.Result('res_1', None, None)
+		res2 = exp_repr.Result('res_2', None, None)
+		m1 = mnm_repr.Model('m1', [], [], [])
+		m2 = mnm_repr.Model('m2', [1], [], [])
+		exporter.set_canonical_ordering(True)
+		try:
+			exported = exporter.export_relevancy_compact({m1:[res1], m2:[res2]})
+		finally:
+			exporter.set_canonical_ordering(False)
+		self.assertEqual(['\nmodel_interventions(m1,0).', '\nres_interventions(1,0).', '\nmodel_interventions(m2,1).', '\nres_interventions(2,1).'], exported)
+
+
+	def test_export_ignored_compact_consistency(self):
+		res1 = exp_repr.Result('res_1', None, None)
+		m = mnm_repr.Model('m1', [], [], [])
+		m.ignored_results = frozenset([res1])
+		exported = exporter.export_ignored_compact_consistency(m)
+		self.assertEqual(['\nignored(1).', '\n:- inconsistent(Model, Result).'], exported)
@@ -0,0 +1,90 @@
+#! /usr/bin/env python3
+# I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
+
+import unittest
+import mnm_repr
+import exp_repr
+import model_simulator
+
+
+class ModelSimulatorTest(unittest.TestCase):
+	def setUp(self):
+		self.comp = mnm_repr.Cytosol()
+		self.met1 = mnm_repr.Metabolite('met1')
+		self.met2 = mnm_repr.Metabolite('met2')
+		self.met3 = mnm_repr.Metabolite('met3')
+		self.cond1 = mnm_repr.PresentEntity(self.met1, self.comp)
+		self.cond2 = mnm_repr.PresentEntity(self.met2, self.comp)
+		self.cond3 = mnm_repr.PresentEntity(self.met3, self.comp)
+		# met1 -> met2 (needs enzyme), met2 -> met3
+		self.act1 = mnm_repr.Reaction('act1', [self.cond1, mnm_repr.PresentCatalyst(self.comp)], [self.cond2])
+		self.act2 = mnm_repr.Reaction('act2', [self.cond2], [self.cond3])
+		self.enzyme = mnm_repr.Protein('enz', properties=[mnm_repr.Catalyses(self.act1)])
+		self.cond_enz = mnm_repr.PresentEntity(self.enzyme, self.comp)
+		self.index = model_simulator.ElementsIndex([self.met1, self.met2, self.met3, self.enzyme], [self.comp])
+
+
+	def result(self, exp_type, outcome):
+		return exp_repr.Result('res_0', exp_repr.ExperimentDescription(exp_type, []), outcome)
+
+
+	def test_active_with_enzyme(self):
+		model = mnm_repr.Model('m_0', [self.cond1, self.cond_enz], [self.act1, self.act2], [self.cond3])
+		sim = model_simulator.ModelSimulation(model, self.index)
+		self.assertEqual(sim.active, set(['act1', 'act2']))
+		self.assertTrue(sim.is_synthesizable(self.cond3))
+		self.assertTrue(sim.is_clean())
+
+
+	def test_elimination_propagates(self):
+		model = mnm_repr.Model('m_0', [self.cond1], [self.act1, self.act2], [self.cond3])
+		sim = model_simulator.ModelSimulation(model, self.index)
+		self.assertEqual(sim.eliminated, set(['act1', 'act2'])) # no enzyme: act1 out, then act2 has no substrate
+		self.assertFalse(sim.is_synthesizable(self.cond3))
+		self.assertFalse(sim.is_clean())
+
+
+	def test_predictions(self):
+		model = mnm_repr.Model('m_0', [self.cond1, self.cond_enz], [self.act1, self.act2], [])
+		sim = model_simulator.ModelSimulation(model, self.index)
+		self.assertEqual(sim.predictions(exp_repr.DetectionEntity('met3')), set(['true']))
+		self.assertEqual(sim.predictions(exp_repr.DetectionEntity('other')), set())
+		self.assertEqual(sim.predictions(exp_repr.LocalisationEntity('met3', 'c_05')), set(['true']))
+		self.assertEqual(sim.predictions(exp_repr.LocalisationEntity('met3', 'c_01')), set()) # compartment unknown
+		self.assertEqual(sim.predictions(exp_repr.DetectionActivity('act2')), set(['true']))
+		self.assertEqual(sim.predictions(exp_repr.ReconstructionActivity('act1')), set()) # enzyme required
+		self.assertEqual(sim.predictions(exp_repr.ReconstructionActivity('act2')), set(['true']))
+		self.assertEqual(sim.predictions(exp_repr.ReconstructionEnzReaction('act1', 'enz')), set(['true']))
+		self.assertTrue(sim.inconsistent(self.result(exp_repr.DetectionEntity('met3'), 'false')))
+		self.assertFalse(sim.inconsistent(self.result(exp_repr.DetectionEntity('met3'), 'true')))
+
+
+	def test_consistent(self):
+		model = mnm_repr.Model('m_0', [self.cond1, self.cond_enz], [self.act1, self.act2], [self.cond3])
+		res = self.result(exp_repr.DetectionEntity('met3'), 'false')
+		self.assertTrue(model_simulator.consistent(model, {model:[]}, self.index))
+		self.assertFalse(model_simulator.consistent(model, {model:[res]}, self.index))
+		model.ignored_results = frozenset([res])
+		self.assertTrue(model_simulator.consistent(model, {model:[res]}, self.index))
+
+
+	def test_related_elements(self):
+		met4 = mnm_repr.Metabolite('met4')
+		act3 = mnm_repr.Reaction('act3', [mnm_repr.PresentEntity(met4, self.comp)], []) # disconnected
+		related = model_simulator.related_elements([self.act1, self.act2, act3], self.index, set([('entity', 'met3')]))
+		self.assertTrue(('activity', 'act1') in related) # through met2
+		self.assertTrue(('entity', 'enz') in related) # catalyst of act1
+		self.assertFalse(('activity', 'act3') in related)
+		res = exp_repr.Result('res_0', exp_repr.ExperimentDescription(exp_repr.DetectionActivity('act2'), [mnm_repr.Remove(self.cond1)]), 'true')
+		self.assertEqual(model_simulator.result_elements(res), set([('activity', 'act2'), ('entity', 'met1')]))
+
+
+	def test_components(self):
+		met4 = mnm_repr.Metabolite('met4')
+		act3 = mnm_repr.Reaction('act3', [mnm_repr.PresentEntity(met4, self.comp)], []) # disconnected
+		component = model_simulator.components([self.act1, self.act2, act3], self.index, [])
+		self.assertEqual(component[('activity', 'act1')], component[('entity', 'met3')])
+		self.assertEqual(component[('entity', 'enz')], component[('activity', 'act2')])
+		self.assertNotEqual(component[('activity', 'act3')], component[('activity', 'act1')])
+		component = model_simulator.components([self.act1, self.act2, act3], self.index, [set([('entity', 'met4'), ('entity', 'met1')])])
+		self.assertEqual(component[('activity', 'act3')], component[('activity', 'act1')]) # joined by a result
@@ -2,10 +2,43 @@
 # I, Robert Rozanski, the copyright holder of this work, release this work into the public domain. This applies worldwide. In some countries this may not be legally possible; if so: I grant anyone the right to use this work for any purpose, without any conditions, unless such conditions are required by law.
 
 import unittest
-from revision_module import RevisionModule, RevCAddB, RevCIAddB
+import random
+import subprocess
+import os
+from time import sleep
+from threading import Lock
+from multiprocessing import Pool
+import revision_module
+from revision_module import RevisionModule, RevCAddB, RevCAddR, RevCIAddB, RevLSAddB, init_worker
 import mnm_repr
 import exp_repr
-from archive import Archive, AdditionalModels, NewResults
+from archive import Archive, AdditionalModels, AdditModProdFail, NewResults, InitialModels, RefutedModels, RevisedModel, ChosenExperiment, AcceptedResults
+
+
+class CannedRevision(RevCAddB): # solver replaced by a fixed solution: add act2
+	solver_calls = 0
+
+	def execute_revision(self, base_model, ignoring, force_new_model):
+		self.solver_calls += 1
+		return [(['act2'], [], [], [])]
+
+
+class TwoSolutionsRevision(CannedRevision):
+	def execute_revision(self, base_model, ignoring, force_new_model):
+		self.solver_calls += 1
+		return [(['act1'], [], [], []), (['act2'], [], [], [])]
+
+
+def start_solver_task(seconds): # in a pool worker: solver left running, as if its output were still being read
+	return revision_module._worker_module.start_solver(['sleep', str(seconds)]).pid
+
+
+def running(pid): # not finished (zombies of killed processes may wait to be reaped)
+	try:
+		with open('/proc/%s/stat' % pid) as f:
+			return f.read().split(') ')[1][0] != 'Z'
+	except FileNotFoundError:
+		return False
 
 
 class RevisionModuleTest(unittest.TestCase):
@@ -48,6 +81,128 @@ class RevisionModuleTest(unittest.TestCase):
 		models_results = rev.make_derivative_models(base_model, extracted_results)
 
 
+	def test_process_output_revision_compact_results(self):
+		rev = RevisionModule('archive', compact_results=True)
+		raw_output = 'Answer 1:\n add(act_1) ignored(3) not inconsistent(5)\n\n\x1b'
+		out = rev.process_output_revision(raw_output)
+		self.assertEqual(out, [(['act_1'], [], ['res_5'], ['res_3'])])
+
+
+	def test_iter_output_revision_streamed(self):
+		rev = RevisionModule('archive')
+		read = []
+		def lines(): # XHAIL output as it arrives
+			for line in ['Reading...\n', 'Answer 1:\n', ' add(act_1) not inconsistent(res_1)\n', '\n', '\x1b[0mAnswer 2:\n', ' remove(act_2) ignored(res_1)\n', '\n', '\x1b[0m\n', 'never read\n']:
+				read.append(line)
+				yield line
+		solutions = rev.iter_output_revision(lines())
+		self.assertEqual(next(solutions), (['act_1'], [], ['res_1'], []))
+		self.assertEqual(next(solutions), ([], ['act_2'], [], ['res_1']))
+		self.assertEqual(len(read), 8) # second answer complete: stopped there
+
+
+	def test_collect_solutions_truncated(self):
+		rev = RevisionModule('archive', max_solutions=1)
+		lines = (line for line in ['Answer 1:\n', ' add(act_1)\n', '\n', '\x1b[0mAnswer 2:\n', ' add(act_2)\n', '\n', '\x1b[0m\n'])
+		self.assertEqual(rev.collect_solutions(lines), [(['act_1'], [], [], [])])
+		self.assertEqual(rev.truncation, ('solutions', True))
+		self.assertEqual(list(lines), []) # closed: XHAIL would be stopped
+
+
+	def test_stop_solver(self):
+		rev = RevisionModule('archive', time_budget=1)
+		lock = Lock()
+		process = subprocess.Popen(['sleep', '10'], start_new_session=True)
+		rev.stop_solver(process, lock, {'done':True, 'stopped':False}) # output already read to the end
+		self.assertEqual(process.poll(), None)
+		flags = {'done':False, 'stopped':False}
+		rev.stop_solver(process, lock, flags)
+		process.wait()
+		self.assertTrue(flags['stopped'] and (process.returncode < 0))
+		self.assertEqual(rev.truncation, None) # decided by stream_xhail once the solver is gone
+
+
+	def test_stop_worker(self):
+		pool = Pool(processes=1, initializer=init_worker, initargs=(RevisionModule('archive'), []))
+		pid = pool.apply(start_solver_task, (30,))
+		self.assertTrue(running(pid))
+		pool.terminate() # e.g. speculation discarded
+		pool.join()
+		for attempt in range(50):
+			if not running(pid):
+				break
+			sleep(0.02)
+		self.assertFalse(running(pid))
+
+
+	def test_process_output_revision_batch(self):
+		rev = RevisionModule('archive')
+		raw_output = ('Answer 1:\n add(act_1,base_0) ignored(res_2,base_1) not inconsistent(deriv_base_0_0,res_1) not inconsistent(base_1,res_3)\n\n\x1b'
+			'Answer 2:\n add(act_1,base_0) remove(act_4,base_1) not inconsistent(deriv_base_0_0,res_1) not inconsistent(base_1,res_2) not inconsistent(base_1,res_3)\n\n\x1b')
+		out = rev.process_output_revision_batch(raw_output.split('\n'), {'base_0':0, 'deriv_base_0_0':0, 'base_1':1}, 2)
+		self.assertEqual(out[0], [(['act_1'], [], ['res_1'], [])]) # the same in both answers
+		self.assertEqual(out[1], [([], [], ['res_3'], ['res_2']), ([], ['act_4'], ['res_2', 'res_3'], [])])
+
+
+	def test_check_consistency_engine(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		act = mnm_repr.Reaction('act1', [cond1], [cond2])
+		arch = Archive()
+		arch.mnm_entities = [met1, met2]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act]
+		base_model = mnm_repr.Model('m1', [cond1], [act], [cond2])
+		rev = RevisionModule(arch)
+		self.assertTrue(rev.check_consistency(base_model))
+		# met2 not detected when met1 removed from the setup: consistent
+		exd = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), [mnm_repr.Remove(cond1)])
+		arch.known_results = [exp_repr.Experiment('exp_0', [exp_repr.Result('res_0', exd, 'false')])]
+		self.assertTrue(rev.check_consistency(base_model))
+		# met2 not detected without interventions: inconsistent
+		exd = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), [])
+		arch.known_results.append(exp_repr.Experiment('exp_1', [exp_repr.Result('res_1', exd, 'false')]))
+		self.assertFalse(rev.check_consistency(base_model))
+		self.assertRaises(ValueError, RevisionModule, arch, consistency_check='other')
+
+
+	def test_process_output_consistency_batch(self):
+		rev = RevisionModule('archive', consistency_check='batch')
+		models = [mnm_repr.Model('m_1', [], [], []), mnm_repr.Model('m_2', [], [], []), mnm_repr.Model('m_3', [], [], [])]
+		raw_output = 'clasp version 2.0.5\nReading from stdin\nSolving...\nAnswer: 1\nfailed(m_1) failed(m_3)\nSATISFIABLE\n'
+		self.assertEqual(rev.process_output_consistency_batch(raw_output, models), [False, True, False])
+		self.assertRaises(ValueError, rev.process_output_consistency_batch, 'ERROR', models)
+
+
+	def test_check_consistency_batch_empty(self):
+		rev = RevisionModule(Archive(), consistency_check='batch')
+		self.assertEqual(rev.check_consistency_batch([]), []) # no solver call
+
+
+	def test_check_consistency_incremental(self):
+		met1 = mnm_repr.Metabolite('met1')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		arch = Archive()
+		arch.mnm_entities = [met1]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		base_model = mnm_repr.Model('m1', [cond1], [], [])
+		res0 = exp_repr.Result('res_0', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), []), 'true')
+		res1 = exp_repr.Result('res_1', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), []), 'false')
+		arch.known_results = [exp_repr.Experiment('exp_0', [res0])]
+		rev = RevisionModule(arch, incremental_consistency=True)
+		self.assertEqual(rev.unverified_results(base_model, rev.extract_results()), [res0])
+		self.assertTrue(rev.check_consistency(base_model))
+		self.assertEqual(rev.unverified_results(base_model, rev.extract_results()), [])
+		arch.known_results.append(exp_repr.Experiment('exp_1', [res1]))
+		self.assertEqual(rev.unverified_results(base_model, rev.extract_results()), [res1])
+		self.assertFalse(rev.check_consistency(base_model))
+		base_model.ignored_results = frozenset([res1]) # ignored results changed: full check
+		self.assertEqual(rev.unverified_results(base_model, rev.extract_results()), [res0, res1])
+		self.assertTrue(rev.check_consistency(base_model))
+
+
 #	def test_check_consistency_positive(self):
 #		met1 = mnm_repr.Metabolite('met1')
 #		met2 = mnm_repr.Metabolite('met2')
@@ -216,3 +371,396 @@ class RevisionModuleTest(unittest.TestCase):
 #		out = rev.revise(mod)
 #		self.assertEqual(out[0], [])
 #		self.assertEqual(out[1], True)
+
+
+	def test_revision_candidates_pruned(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		met3 = mnm_repr.Metabolite('met3')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		cond3 = mnm_repr.PresentEntity(met3, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act2 = mnm_repr.Reaction('act2', [cond2], [cond1])
+		act3 = mnm_repr.Reaction('act3', [cond3], [cond3]) # unrelated to met1 and met2
+		for act in [act1, act2, act3]:
+			act.add_cost = 1
+			act.remove_cost = 1
+		arch = Archive()
+		arch.mnm_entities = [met1, met2, met3]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1, act2, act3]
+		res0 = exp_repr.Result('res_0', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), []), 'false') # inconsistent
+		res1 = exp_repr.Result('res_1', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met3'), []), 'true')
+		arch.known_results = [exp_repr.Experiment('exp_0', [res0, res1])]
+		base_model = mnm_repr.Model('m_0', [cond1, cond3], [act1], [])
+		rev = RevisionModule(arch)
+		(add_act, rem_act, ign_res) = rev.revision_candidates(base_model, True)
+		self.assertEqual((add_act, rem_act, set(ign_res)), (set([act2, act3]), set([act1]), set([res0, res1])))
+		rev = RevisionModule(arch, prune_candidates=True)
+		(add_act, rem_act, ign_res) = rev.revision_candidates(base_model, True)
+		self.assertEqual((add_act, rem_act, ign_res), (set([act2]), set([act1]), [res0]))
+		(add_act, rem_act, ign_res) = rev.revision_candidates(base_model, True, True) # new model: not pruned
+		self.assertEqual((add_act, rem_act, set(ign_res)), (set([act2, act3]), set([act1]), set([res0, res1])))
+		# removing act1 refuted (with act2 or without): the only permitted revision adds act3, outside the component
+		arch.record(InitialModels([mnm_repr.Model(None, [cond1, cond3], [], []), mnm_repr.Model(None, [cond1, cond3], [act2], [])]))
+		arch.record(RefutedModels(list(arch.working_models)))
+		rev = RevisionModule(arch, prune_candidates=True, exclude_refuted=True)
+		self.assertEqual(len(rev.excluded_models(base_model)), 2)
+		(add_act, rem_act, ign_res) = rev.revision_candidates(base_model, True)
+		self.assertEqual((add_act, rem_act, set(ign_res)), (set([act2, act3]), set([act1]), set([res0, res1])))
+
+
+	def test_revision_candidates_pruned_termination(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		met3 = mnm_repr.Metabolite('met3')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		cond3 = mnm_repr.PresentEntity(met3, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act2 = mnm_repr.Reaction('act2', [cond1], [cond3])
+		act3 = mnm_repr.Reaction('act3', [cond3], [])
+		for act in [act1, act2, act3]:
+			act.add_cost = 1
+			act.remove_cost = 1
+		arch = Archive()
+		arch.mnm_entities = [met1, met2, met3]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1, act2, act3]
+		rev = RevisionModule(arch, prune_candidates=True)
+		# met3 synthesized: its termination condition is not a violation, nothing to revise around it
+		met_model = mnm_repr.Model('m_0', [cond1], [act1, act2], [cond2, cond3])
+		self.assertEqual(rev.violation_seeds(met_model), set())
+		self.assertEqual(rev.revision_candidates(met_model, False), (set(), set(), []))
+		# met3 not synthesized: everything connected to it
+		unmet_model = mnm_repr.Model('m_1', [cond1], [act1], [cond2, cond3])
+		self.assertEqual(rev.violation_seeds(unmet_model), set([('entity', 'met3')]))
+		(add_act, rem_act, ign_res) = rev.revision_candidates(unmet_model, False)
+		self.assertEqual((add_act, rem_act), (set([act2, act3]), set([act1])))
+
+
+	def test_execute_revision_decomposed(self):
+		mets = [mnm_repr.Metabolite('met%s' % number) for number in range(6)]
+		conds = [mnm_repr.PresentEntity(met, mnm_repr.Medium()) for met in mets]
+		act1 = mnm_repr.Reaction('act1', [conds[1]], [conds[2]])
+		act2 = mnm_repr.Reaction('act2', [conds[2]], [conds[1]])
+		act3 = mnm_repr.Reaction('act3', [conds[3]], [conds[4]]) # unrelated to met1 and met2
+		for act in [act1, act2, act3]:
+			act.add_cost = 1
+			act.remove_cost = 1
+		arch = Archive()
+		arch.mnm_entities = mets
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1, act2, act3]
+		res0 = exp_repr.Result('res_0', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), []), 'false') # inconsistent
+		res1 = exp_repr.Result('res_1', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met4'), []), 'false') # inconsistent
+		res2 = exp_repr.Result('res_2', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met5'), []), 'false')
+		arch.known_results = [exp_repr.Experiment('exp_0', [res0, res1, res2])]
+		base_model = mnm_repr.Model('m_0', [conds[1], conds[3]], [act1, act3], [])
+		calls = []
+		class PartsRevision(RevisionModule):
+			def execute_revision(self, base_model, ignoring, force_new_model, candidates=None, results=None):
+				calls.append((base_model.setup_conditions, base_model.intermediate_activities, candidates, results))
+				if act1 in base_model.intermediate_activities:
+					return [([], ['act1'], ['res_0'], []), (['act2'], [], ['res_0'], [])]
+				return [([], ['act3'], ['res_1'], [])]
+		rev = PartsRevision(arch, decompose=True)
+		solutions = rev.prepare_input_and_execute(base_model, True, False)
+		self.assertEqual(len(calls), 2)
+		parts = sorted(calls, key=lambda call: sorted([act.ID for act in call[1]]))
+		self.assertEqual(parts[0][:2], (frozenset([conds[1]]), frozenset([act1])))
+		self.assertEqual(parts[0][2], (set([act2]), set([act1]), [res0]))
+		self.assertEqual(parts[0][3], [res0])
+		self.assertEqual(parts[1][:2], (frozenset([conds[3]]), frozenset([act3])))
+		self.assertEqual(parts[1][2], (set([]), set([act3]), [res1]))
+		self.assertEqual(set([(tuple(sorted(sol[0])), tuple(sorted(sol[1])), tuple(sorted(sol[2])), tuple(sol[3])) for sol in solutions]),
+			set([((), ('act1', 'act3'), ('res_0', 'res_1', 'res_2'), ()), (('act2',), ('act3',), ('res_0', 'res_1', 'res_2'), ())]))
+		rev = PartsRevision(arch, decompose=True, max_solutions=1)
+		self.assertEqual(len(rev.prepare_input_and_execute(base_model, True, False)), 1)
+		self.assertEqual(rev.truncation, ('solutions', True))
+		del calls[:]
+		rev.prepare_input_and_execute(base_model, True, True) # new model: whole structure compared
+		self.assertEqual(calls, [(base_model.setup_conditions, base_model.intermediate_activities, None, None)])
+		self.assertRaises(ValueError, PartsRevision, arch, decompose=True, warm_start=True) # bounds for whole models only
+
+
+	def test_reduced_results(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act1.remove_cost = 1
+		arch = Archive()
+		arch.mnm_entities = [met1, met2]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1]
+		res0 = exp_repr.Result('res_0', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), []), 'false')
+		res1 = exp_repr.Result('res_1', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), []), 'false') # repeated
+		res2 = exp_repr.Result('res_2', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), []), 'true')
+		arch.known_results = [exp_repr.Experiment('exp_0', [res0, res2]), exp_repr.Experiment('exp_1', [res1])]
+		rev = RevisionModule(arch, reduce_results=True)
+		(representatives, members, penalties) = rev.reduced_results([res0, res1, res2])
+		self.assertEqual(representatives, [res0, res2])
+		self.assertEqual(members, {'res_0':['res_0', 'res_1'], 'res_2':['res_2']})
+		self.assertEqual(penalties, {'res_0':2, 'res_2':1})
+		base_model = mnm_repr.Model('m_0', [cond1], [act1], [])
+		base_model.ignored_results = frozenset([res0])
+		self.assertEqual(rev.consistency_results(base_model, [res0, res1, res2]), [res1, res2]) # res_1 not ignored
+		self.assertFalse(rev.check_consistency_against(base_model, [res0, res1, res2]))
+		programs = []
+		class CannedRevision(RevisionModule):
+			def stream_xhail(self, inpt):
+				programs.append(''.join(inpt))
+				return (line for line in ['Answer 1:\n', ' ignored(res_0) not inconsistent(res_2)\n', '\n', '\x1b[0m\n'])
+		rev = CannedRevision(arch, reduce_results=True)
+		solutions = rev.execute_revision(base_model, True, False)
+		self.assertEqual(solutions, [([], [], ['res_2'], ['res_0', 'res_1'])])
+		self.assertIn('#modeh ignored(res_0) =2 @2.', programs[0])
+		self.assertNotIn('res_1', programs[0])
+
+
+	def test_warm_start(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act1.add_cost = 1
+		arch = Archive()
+		arch.mnm_entities = [met1, met2]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1]
+		res0 = exp_repr.Result('res_0', exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), []), 'true')
+		arch.known_results = [exp_repr.Experiment('exp_0', [res0])]
+		base_model = mnm_repr.Model('m_0', [cond1], [], [])
+		bounds = []
+		class BoundedRevision(RevisionModule):
+			def execute_revision(self, base_model, ignoring, force_new_model, candidates=None, results=None, bound=None):
+				bounds.append(bound)
+				if bound != None: # as if the bound were wrong
+					return []
+				return [(['act1'], [], ['res_0'], [])]
+		rev = BoundedRevision(arch, warm_start=True)
+		self.assertEqual(rev.prepare_input_and_execute(base_model, False, False), [(['act1'], [], ['res_0'], [])])
+		self.assertEqual(bounds, [None]) # nothing known about the lineage yet
+		revised = mnm_repr.Model('m_1', [cond1], [act1], [])
+		self.assertEqual(rev.warm_starts[(revised.setup_conditions, revised.intermediate_activities, revised.termination_conditions)], [frozenset([act1])])
+		self.assertEqual(rev.warm_start_bound(base_model, False, rev.revision_candidates(base_model, False)), (0, 1))
+		arch.record(InitialModels([revised]))
+		self.assertEqual(rev.warm_start_bound(base_model, True, rev.revision_candidates(base_model, False, True)), None) # not new
+		del bounds[:]
+		self.assertEqual(rev.prepare_input_and_execute(base_model, False, False), [(['act1'], [], ['res_0'], [])])
+		self.assertEqual(bounds, [(0, 1), None]) # bounded search failed: repeated without the bound
+
+
+	def test_excluded_models(self):
+		act1 = mnm_repr.Reaction('act1', [], [])
+		act2 = mnm_repr.Reaction('act2', [mnm_repr.PresentEntity(mnm_repr.Metabolite('met1'), mnm_repr.Medium())], [])
+		arch = Archive()
+		arch.mnm_activities = [act1, act2]
+		arch.record(InitialModels([mnm_repr.Model(None, [], [act1], []), mnm_repr.Model(None, [], [act2], [])]))
+		arch.record(RefutedModels([mnm_repr.Model(None, [], [act1], [])]))
+		base_model = mnm_repr.Model('base', [], [act2], [])
+		self.assertEqual(RevisionModule(arch).excluded_models(base_model), [])
+		rev = RevisionModule(arch, exclude_refuted=True)
+		excluded = rev.excluded_models(base_model)
+		self.assertEqual([(mod.ID, mod.intermediate_activities) for mod in excluded], [('refuted_0', frozenset([act1]))])
+		self.assertEqual(rev.excluded_models(mnm_repr.Model('base', [], [act1], [])), []) # may be revised by ignoring only
+
+
+	def test_screened_random_model(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act2 = mnm_repr.Reaction('act2', [cond2], [cond1])
+		act3 = mnm_repr.Reaction('act3', [cond2], [])
+		arch = Archive()
+		arch.mnm_entities = [met1, met2]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1, act2, act3]
+		arch.record(InitialModels([mnm_repr.Model(None, [cond1], [], [cond2])])) # met2 needs act1
+		random.seed(0)
+		rev = RevCAddR(arch, random_candidates=50)
+		model = rev.create_screened_random_model()
+		self.assertTrue(act1 in model.intermediate_activities)
+		self.assertTrue(rev.check_consistency(model))
+		rev.produce_additional_models() # consistent candidate: no revision needed
+		self.assertEqual(len(arch.development_history[-1].additional_models), 1)
+
+
+	def test_diverse_models(self):
+		mets = [mnm_repr.Metabolite('met%s' % number) for number in range(5)]
+		conds = [mnm_repr.PresentEntity(met, mnm_repr.Medium()) for met in mets]
+		acts = [mnm_repr.Reaction('act%s' % number, [conds[0]], [conds[number]]) for number in range(1, 5)]
+		arch = Archive()
+		arch.mnm_activities = acts
+		pool = [mnm_repr.Model(None, [], [acts[0]], []), mnm_repr.Model(None, [], [acts[0], acts[1]], [])]
+		arch.record(InitialModels(pool))
+		near = mnm_repr.Model('near', [], [acts[0], acts[1], acts[2]], [])
+		far = mnm_repr.Model('far', [], [acts[2], acts[3]], [])
+		rev = RevisionModule(arch, diverse_models=True, min_distance=2)
+		self.assertEqual(rev.pool_distances([near, far], pool), [1, 3])
+		self.assertEqual(rev.pool_distances([near], []), [None])
+		self.assertTrue(rev.choose_new_model(None, [near, far]) is far)
+		self.assertTrue(rev.choose_new_model(pool[1], [near]) is near)
+		self.assertFalse(rev.record_additional_models([near])) # too close to a working model
+		self.assertTrue(isinstance(arch.development_history[-1], AdditModProdFail))
+		self.assertTrue(rev.record_additional_models([near, far]))
+		self.assertEqual(arch.development_history[-1].additional_models, frozenset([far]))
+
+
+	def test_test_and_revise_all_parallel(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act2 = mnm_repr.Reaction('act2', [cond2], [cond1])
+		arch = Archive()
+		arch.mnm_entities = [met1, met2]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1, act2]
+		consistent_model = mnm_repr.Model(None, [cond1], [act1], [cond2])
+		inconsistent_model = mnm_repr.Model(None, [cond1], [], [cond2]) # met2 not synthesizable
+		arch.record(InitialModels([consistent_model, inconsistent_model]))
+		rev = CannedRevision(arch, sfx='parallel_test', processes=2)
+		rev.test_and_revise_all()
+		refuted = [e for e in arch.development_history if isinstance(e, RefutedModels)][0]
+		revised = [e for e in arch.development_history if isinstance(e, RevisedModel)][0]
+		self.assertEqual(refuted.refuted_models, frozenset([inconsistent_model]))
+		self.assertEqual(revised.old_model, inconsistent_model)
+		self.assertEqual([m.intermediate_activities for m in revised.revised_models], [frozenset([act2])])
+		self.assertIn(consistent_model, arch.working_models)
+
+
+	def test_speculation(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act2 = mnm_repr.Reaction('act2', [cond2], [cond1])
+		exd = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), [mnm_repr.Remove(cond1)])
+		def run(results, speculate):
+			arch = Archive()
+			arch.mnm_entities = [met1, met2]
+			arch.mnm_compartments = [mnm_repr.Medium()]
+			arch.mnm_activities = [act1, act2]
+			arch.record(InitialModels([mnm_repr.Model(None, [cond1], [act1], [cond2])]))
+			rev = CannedRevision(arch, sfx='speculation_test', speculate=speculate)
+			arch.record(ChosenExperiment([exd])) # both outcomes checked and revised in the background
+			exp = exp_repr.Experiment(None, [exp_repr.Result(None, description, outcome) for (description, outcome) in results])
+			arch.record(NewResults(exp))
+			arch.record(AcceptedResults(exp))
+			rev.test_and_revise_all()
+			events = [type(e).__name__ for e in arch.development_history]
+			structures = set([m.intermediate_activities for m in arch.working_models])
+			return (rev, events, structures)
+		for outcome in ['true', 'false']:
+			(rev, events, structures) = run([(exd, outcome)], True)
+			self.assertEqual(rev.solver_calls, 0) # solved in a worker
+			self.assertEqual((events, structures), run([(exd, outcome)], False)[1:])
+		other = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), [])
+		(rev, events, structures) = run([(other, 'false')], True) # not speculated: revised as usual
+		self.assertEqual(rev.solver_calls, 1)
+		self.assertEqual(rev._speculation, None)
+		self.assertEqual(structures, set([frozenset([act1, act2])]))
+
+
+	def test_revision_cache(self):
+		met1 = mnm_repr.Metabolite('met1')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		act2 = mnm_repr.Reaction('act2', [cond1], [])
+		arch = Archive()
+		arch.mnm_activities = [act2]
+		rev = CannedRevision(arch, revision_cache=True)
+		model = mnm_repr.Model('m_0', [cond1], [], [])
+		same_structure = mnm_repr.Model('m_1', [cond1], [], [])
+		rev.revise(model)
+		rev.revise(same_structure)
+		self.assertEqual(rev.solver_calls, 1)
+		rev.revise(model, True) # force new model: different program
+		self.assertEqual(rev.solver_calls, 2)
+		exd = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), [])
+		arch.known_results.append(exp_repr.Experiment('exp_0', [exp_repr.Result('res_0', exd, 'true')]))
+		rev.revise(model) # new evidence
+		self.assertEqual(rev.solver_calls, 3)
+		self.assertEqual(len(rev.revision_cache), 1)
+
+
+	def test_reservoir(self):
+		met1 = mnm_repr.Metabolite('met1')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [])
+		act2 = mnm_repr.Reaction('act2', [], [cond1])
+		arch = Archive()
+		arch.mnm_activities = [act1, act2]
+		model = mnm_repr.Model(None, [cond1], [], [])
+		arch.record(InitialModels([model]))
+		rev = TwoSolutionsRevision(arch, reservoir_size=5)
+		(new_mods, updated) = rev.revise(model)
+		self.assertEqual(len(rev.reservoir), 1) # the solution not chosen
+		self.assertNotEqual(rev.reservoir[0].intermediate_activities, new_mods[0].intermediate_activities)
+		rev.produce_additional_models() # drawn from the reservoir: no solver call
+		self.assertEqual(rev.solver_calls, 1)
+		self.assertIsInstance(arch.development_history[-1], AdditionalModels)
+		self.assertEqual(rev.reservoir, [])
+		rev.revise(model)
+		exd = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met1'), [])
+		arch.known_results.append(exp_repr.Experiment('exp_0', [exp_repr.Result('res_0', exd, 'true')]))
+		self.assertEqual(rev.draw_from_reservoir(), None) # stale after new evidence
+
+
+	def test_local_search_revision(self):
+		met1 = mnm_repr.Metabolite('met1')
+		met2 = mnm_repr.Metabolite('met2')
+		cond1 = mnm_repr.PresentEntity(met1, mnm_repr.Medium())
+		cond2 = mnm_repr.PresentEntity(met2, mnm_repr.Medium())
+		act1 = mnm_repr.Reaction('act1', [cond1], [cond2])
+		act2 = mnm_repr.Reaction('act2', [cond2], [cond1]) # no use
+		act1.add_cost = 1
+		act2.add_cost = 1
+		arch = Archive()
+		arch.mnm_entities = [met1, met2]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1, act2]
+		exd = exp_repr.ExperimentDescription(exp_repr.DetectionEntity('met2'), [])
+		res = exp_repr.Result('res_0', exd, 'false')
+		arch.known_results = [exp_repr.Experiment('exp_0', [res])]
+		base_model = mnm_repr.Model('m_0', [cond1], [], [cond2])
+		rev = RevLSAddB(arch)
+		self.assertEqual(rev.execute_revision(base_model, False, False), []) # met2 detected: res_0 can't be explained
+		rev = RevLSAddB(arch, ignoring=True)
+		self.assertEqual(rev.execute_revision(base_model, True, False), [(['act1'], [], [], ['res_0'])])
+		self.assertEqual(rev.truncation, None) # every state visited
+		for narrow in [RevLSAddB(arch, ignoring=True, beam_width=1, revision_cache=True), RevLSAddB(arch, ignoring=True, max_changes=1, revision_cache=True)]:
+			self.assertEqual(narrow.prepare_input_and_execute(base_model, True, False), [(['act1'], [], [], ['res_0'])])
+			self.assertEqual(narrow.truncation, ('heuristic', False))
+			self.assertEqual(narrow.revision_cache, {}) # not proven optimal: not cached
+		stopped = RevLSAddB(arch, ignoring=True, time_budget=0) # stopped at once
+		self.assertEqual(stopped.revise(base_model), ([], False)) # no answer in time: no change, not a failure
+		self.assertEqual((arch.development_history[-1].reason, arch.development_history[-1].optimal), ('time', False))
+		arch.known_results = []
+		(new_mods, updated) = rev.revise(base_model)
+		self.assertEqual(new_mods[0].intermediate_activities, frozenset([act1]))
+		self.assertTrue(rev.check_consistency(new_mods[0]))
+		# out of time in a cycle: the model stays, the run goes on
+		arch = Archive()
+		arch.mnm_entities = [met1, met2]
+		arch.mnm_compartments = [mnm_repr.Medium()]
+		arch.mnm_activities = [act1, act2]
+		arch.known_results = [exp_repr.Experiment('exp_0', [res])]
+		model = mnm_repr.Model(None, [cond1], [], [cond2])
+		arch.record(InitialModels([model]))
+		RevLSAddB(arch, ignoring=True, time_budget=0).test_and_revise_all()
+		self.assertEqual([type(e).__name__ for e in arch.development_history], ['InitialModels', 'RevisionTruncated', 'RefutedModels'])
+		self.assertEqual(arch.development_history[-1].refuted_models, frozenset([]))
+		self.assertEqual(arch.working_models, set([model]))
+		self.assertFalse(arch.revflag)
+		RevLSAddB(arch, ignoring=True, time_budget=0).produce_additional_models() # nothing recorded as a new model
+		self.assertEqual([type(e).__name__ for e in arch.development_history[3:]], ['RevisionTruncated'])
+		self.assertFalse(arch.revflag)